@@ -0,0 +1,274 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from types import TracebackType
+from typing import Literal, NamedTuple, Optional
+
+import aiohttp
+
+import models
+import urls
+from bandwidth import BandwidthLimiter
+from cache import ResponseCache
+from config import Config
+from headers import get_headers
+from metrics import Metrics
+from policy import RETRYABLE_STATUS_CODES, RequestPolicy
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in RETRYABLE_STATUS_CODES
+    return isinstance(
+        e,
+        (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+        ),
+    )
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    if not isinstance(e, aiohttp.ClientResponseError) or e.headers is None:
+        return None
+    return parse_retry_after(e.headers.get("Retry-After"))
+
+
+class AsyncResponse(NamedTuple):
+    status: int
+    headers: dict[str, str]
+    content: bytes
+
+
+class AsyncRequester:
+    def __init__(
+        self,
+        config: Config,
+        metrics: Optional[Metrics] = None,
+        bandwidth_limiter: Optional[BandwidthLimiter] = None,
+    ) -> None:
+        self.config = config
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.bandwidth_limiter = (
+            bandwidth_limiter
+            if bandwidth_limiter is not None
+            else BandwidthLimiter(config.bandwidth)
+        )
+        self.rate_limiter = AdaptiveRateLimiter(
+            config.request.requests_per_second,
+            config.request.min_requests_per_second,
+            config.request.max_requests_per_second,
+            config.request.max_concurrent_requests,
+            self.__set_rate_limit_gauges,
+        )
+        self.policy = RequestPolicy(config.request)
+        cache_config = config.request.cache
+        self.cache = (
+            ResponseCache(
+                cache_config.file_path,
+                config.auth.token,
+                cache_config.max_size_mb * 1024 * 1024,
+                cache_config.ttl_seconds,
+            )
+            if cache_config.enabled
+            else None
+        )
+        self.proxy = (
+            config.request.proxy_url
+            if config.request.proxy_url is not None and config.request.proxy_url != ""
+            else None
+        )
+        self.__session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self.__session is None:
+            raise RuntimeError("AsyncRequester is not opened")
+        return self.__session
+
+    async def __aenter__(self) -> "AsyncRequester":
+        connect_timeout, read_timeout = self.policy.timeout
+        self.__session = aiohttp.ClientSession(
+            headers={k: str(v) for k, v in get_headers(self.config).items()},
+            connector=aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.config.request.max_connections_per_host,
+            ),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=connect_timeout, sock_read=read_timeout
+            ),
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.session.close()
+        self.__session = None
+
+    async def run_with_policy[T](
+        self, endpoint: str, function: Callable[[], Awaitable[T]]
+    ) -> T:
+        return await self.policy.run_async(
+            endpoint, function, is_retryable, get_retry_after
+        )
+
+    async def __get(self, endpoint: str, url: str) -> bytes:
+        if self.cache is None:
+            resp = await self.run_with_policy(
+                endpoint, lambda: self.__get_once(endpoint, url)
+            )
+            return resp.content
+        key = self.cache.get_key(url)
+        cached = self.cache.get(endpoint, key)
+        if cached is not None and cached.is_fresh:
+            return cached.body
+        headers = cached.get_conditional_headers() if cached is not None else {}
+        resp = await self.run_with_policy(
+            endpoint, lambda: self.__get_once(endpoint, url, headers)
+        )
+        if resp.status == 304 and cached is not None:
+            self.cache.revalidate(key)
+            return cached.body
+        self.cache.put(
+            key,
+            resp.content,
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+        )
+        return resp.content
+
+    async def __get_once(
+        self, endpoint: str, url: str, headers: Optional[dict[str, str]] = None
+    ) -> AsyncResponse:
+        await self.rate_limiter.acquire_async()
+        is_throttled = True
+        retry_after: Optional[float] = None
+        status = "error"
+        started_at = time.monotonic()
+        try:
+            async with self.session.get(url, headers=headers, proxy=self.proxy) as resp:
+                status = str(resp.status)
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                is_throttled = (
+                    resp.status == 429 or resp.status >= 500 or retry_after is not None
+                )
+                resp.raise_for_status()
+                content = await resp.read()
+        finally:
+            self.rate_limiter.release(is_throttled, retry_after)
+            self.metrics.observe(
+                "api_request_duration_seconds",
+                time.monotonic() - started_at,
+                endpoint=endpoint,
+            )
+            self.metrics.add("api_responses_total", 1, endpoint=endpoint, status=status)
+        self.metrics.add("transferred_bytes_total", len(content), kind="api")
+        return AsyncResponse(resp.status, dict(resp.headers), content)
+
+    def __set_rate_limit_gauges(self, rate: float, concurrency: int) -> None:
+        self.metrics.set("api_rate_limit_requests_per_second", rate, requester="async")
+        self.metrics.set("api_rate_limit_concurrency", concurrency, requester="async")
+
+    @asynccontextmanager
+    async def get_media(self, url: str) -> AsyncIterator[aiohttp.ClientResponse]:
+        async with self.session.get(url, proxy=self.proxy) as resp:
+            resp.raise_for_status()
+            yield resp
+
+    async def __iter_pages[T](
+        self, get_page: Callable[[int], Awaitable[models.PagedDataModel[T]]]
+    ) -> AsyncIterator[T]:
+        task = asyncio.ensure_future(get_page(1))
+        try:
+            while True:
+                paged_data = await task
+                next_page = paged_data.pagination.next
+                if next_page is not None:
+                    task = asyncio.ensure_future(get_page(next_page))
+                for item in paged_data.data:
+                    yield item
+                if next_page is None:
+                    return
+        finally:
+            task.cancel()
+
+    async def get_account(self) -> models.AccountModel:
+        url = urls.get_account
+        content = await self.__get("get_account", url)
+        return models.AccountModel.model_validate_json(content)
+
+    async def get_account_subscriptions(self) -> list[models.SubscriptionModel]:
+        url = urls.get_account_subscriptions
+        content = await self.__get("get_account_subscriptions", url)
+        return models.subscriptions_adapter.validate_json(content)
+
+    async def get_plan_posts(
+        self, id: str, per_page: int, page: int
+    ) -> models.PagedDataModel[models.PostFromListModel]:
+        url = urls.get_plan_posts.format(id=id, per_page=per_page, page=page)
+        content = await self.__get("get_plan_posts", url)
+        return models.PagedPostsFromListModel.model_validate_json(content)
+
+    def iter_plan_posts(
+        self, id: str, per_page: int = 200
+    ) -> AsyncIterator[models.PostFromListModel]:
+        return self.__iter_pages(lambda page: self.get_plan_posts(id, per_page, page))
+
+    async def get_post(self, id: str) -> models.PostModel:
+        url = urls.get_post.format(id=id)
+        content = await self.__get("get_post", url)
+        return models.PostModel.model_validate_json(content)
+
+    async def get_post_tags(self, id: str) -> list[models.PostTagModel]:
+        url = urls.get_post_tags.format(id=id)
+        content = await self.__get("get_post_tags", url)
+        return models.post_tags_adapter.validate_json(content)
+
+    async def get_post_videos(self, id: str) -> models.PostVideosModel:
+        url = urls.get_post_videos.format(id=id)
+        content = await self.__get("get_post_videos", url)
+        return models.PostVideosModel.model_validate_json(content)
+
+    async def get_post_details(
+        self, id: str
+    ) -> tuple[models.PostModel, list[models.PostTagModel], models.PostVideosModel]:
+        return await asyncio.gather(
+            self.get_post(id), self.get_post_tags(id), self.get_post_videos(id)
+        )
+
+    async def get_user(
+        self, id_or_username: str, by: Literal["id"] | Literal["username"]
+    ) -> models.UserModel:
+        match by:
+            case "id":
+                endpoint = "get_user"
+                url = urls.get_user.format(id=id_or_username)
+            case "username":
+                endpoint = "get_user_by_username"
+                url = urls.get_user_by_username.format(username=id_or_username)
+        content = await self.__get(endpoint, url)
+        return models.UserModel.model_validate_json(content)
+
+    async def get_user_plans(self, id: str) -> list[models.PlanModel]:
+        url = urls.get_user_plans.format(id=id)
+        content = await self.__get("get_user_plans", url)
+        return models.plans_adapter.validate_json(content)
+
+    async def get_user_posts(
+        self, id: str, per_page: int, page: int
+    ) -> models.PagedDataModel[models.PostFromListModel]:
+        url = urls.get_user_posts.format(id=id, per_page=per_page, page=page)
+        content = await self.__get("get_user_posts", url)
+        return models.PagedPostsFromListModel.model_validate_json(content)
+
+    def iter_user_posts(
+        self, id: str, per_page: int = 200
+    ) -> AsyncIterator[models.PostFromListModel]:
+        return self.__iter_pages(lambda page: self.get_user_posts(id, per_page, page))
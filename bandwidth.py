@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from collections.abc import Callable
+from threading import Lock
+from typing import Literal, Optional
+
+import toml
+
+from config import BandwidthConfig
+
+CONTROL_FILE_CHECK_INTERVAL = 1.0
+
+Lane = Literal["image", "video"]
+
+
+def get_byte_rate(mib_per_second: Optional[float]) -> Optional[float]:
+    if mib_per_second is None or mib_per_second <= 0:
+        return None
+    return mib_per_second * 1024 * 1024
+
+
+def format_byte_rate(rate: Optional[float]) -> str:
+    return "unlimited" if rate is None else f"{rate / 1024 / 1024:.2f} MiB/s"
+
+
+class TokenBucket:
+    def __init__(self, rate: Optional[float]) -> None:
+        self.rate = rate
+        self.__tokens = rate or 0.0
+        self.__updated_at = time.monotonic()
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        self.rate = rate
+        self.__tokens = min(self.__tokens, rate or 0.0)
+
+    def reserve(self, nbytes: int) -> float:
+        if self.rate is None:
+            return 0
+        now = time.monotonic()
+        self.__tokens = min(
+            self.rate, self.__tokens + (now - self.__updated_at) * self.rate
+        )
+        self.__updated_at = now
+        self.__tokens -= nbytes
+        return max(0.0, -self.__tokens / self.rate)
+
+
+class BandwidthLimiter:
+    def __init__(
+        self,
+        config: BandwidthConfig,
+        on_reload: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.config = config
+        self.__on_reload = on_reload
+        self.__lock = Lock()
+        self.__global_bucket = TokenBucket(get_byte_rate(config.max_mib_per_second))
+        self.__lane_bucket_dict: dict[Lane, TokenBucket] = {
+            "image": TokenBucket(get_byte_rate(config.max_image_mib_per_second)),
+            "video": TokenBucket(get_byte_rate(config.max_video_mib_per_second)),
+        }
+        self.__control_file_mtime: Optional[float] = None
+        self.__checked_at = 0.0
+        self.__is_reload_requested = True
+        self.throttled_time = 0.0
+
+    def request_reload(self) -> None:
+        self.__is_reload_requested = True
+
+    def __reload_control_file(self) -> None:
+        file_path = self.config.control_file_path
+        now = time.monotonic()
+        if file_path is None or (
+            not self.__is_reload_requested
+            and now - self.__checked_at < CONTROL_FILE_CHECK_INTERVAL
+        ):
+            return
+        self.__checked_at = now
+        try:
+            mtime = os.stat(file_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self.__control_file_mtime and not self.__is_reload_requested:
+            return
+        self.__is_reload_requested = False
+        self.__control_file_mtime = mtime
+        try:
+            control_dict = toml.load(file_path) if mtime is not None else {}
+            control = BandwidthConfig(**{**self.config.model_dump(), **control_dict})
+            self.__global_bucket.set_rate(get_byte_rate(control.max_mib_per_second))
+            self.__lane_bucket_dict["image"].set_rate(
+                get_byte_rate(control.max_image_mib_per_second)
+            )
+            self.__lane_bucket_dict["video"].set_rate(
+                get_byte_rate(control.max_video_mib_per_second)
+            )
+        except (OSError, ValueError, TypeError) as e:
+            if self.__on_reload is not None:
+                self.__on_reload(f"Failed to load {file_path}: {e}")
+            return
+        if self.__on_reload is not None:
+            self.__on_reload(f"Bandwidth: {self.get_summary()}")
+
+    def __reserve(self, lane: Lane, nbytes: int) -> float:
+        with self.__lock:
+            self.__reload_control_file()
+            delay = max(
+                self.__global_bucket.reserve(nbytes),
+                self.__lane_bucket_dict[lane].reserve(nbytes),
+            )
+            self.throttled_time += delay
+        return delay
+
+    def consume(self, lane: Lane, nbytes: int) -> None:
+        if (delay := self.__reserve(lane, nbytes)) > 0:
+            time.sleep(delay)
+
+    async def consume_async(self, lane: Lane, nbytes: int) -> None:
+        if (delay := self.__reserve(lane, nbytes)) > 0:
+            await asyncio.sleep(delay)
+
+    def get_summary(self) -> str:
+        return (
+            f"{format_byte_rate(self.__global_bucket.rate)} total, "
+            f"{format_byte_rate(self.__lane_bucket_dict['image'].rate)} images, "
+            f"{format_byte_rate(self.__lane_bucket_dict['video'].rate)} videos"
+        )
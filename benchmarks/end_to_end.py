@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+
+import toml
+
+from benchmarks.mock_server import MockServer, MockServerConfig
+from config import (
+    AuthConfig,
+    Config,
+    ConfigTomlEncoder,
+    DownloadConfig,
+    MetricsConfig,
+    RequestConfig,
+)
+
+ROOT_DIR_PATH = path.dirname(path.dirname(path.abspath(__file__)))
+METRICS_FILENAME = "metrics.json"
+
+
+def write_config(work_dir_path: str, use_async: bool = False) -> None:
+    config = Config(
+        request=RequestConfig(use_async=use_async),
+        auth=AuthConfig(token="benchmark"),
+        download=DownloadConfig(),
+        metrics=MetricsConfig(json_file_path=METRICS_FILENAME),
+    )
+    with open(path.join(work_dir_path, "config.toml"), "w") as f:
+        toml.dump(config.model_dump(), f, encoder=ConfigTomlEncoder())
+
+
+def get_post_count(metrics: dict) -> int:
+    return sum(
+        histogram["count"]
+        for histogram in metrics["histograms"]
+        if histogram["name"] == "phase_duration_seconds"
+        and histogram["labels"].get("phase") == "post"
+    )
+
+
+def get_transferred_size(metrics: dict) -> float:
+    return sum(
+        counter["value"]
+        for counter in metrics["counters"]
+        if counter["name"] == "transferred_bytes_total"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run main against a local mock myfans server"
+    )
+    parser.add_argument("--creators", type=int, default=4)
+    parser.add_argument("--posts", type=int, default=50)
+    parser.add_argument("--plans", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--segment-format", choices=["fmp4", "ts"], default="fmp4")
+    parser.add_argument("--use-async", action="store_true")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    server = MockServer(
+        "127.0.0.1",
+        0,
+        MockServerConfig(
+            creator_count=args.creators,
+            post_count=args.posts,
+            plan_count=args.plans,
+            latency=args.latency,
+            bandwidth=args.bandwidth,
+            error_rate=args.error_rate,
+            segment_format=args.segment_format,
+        ),
+    )
+    server.start()
+    work_dir_path = tempfile.mkdtemp(prefix="myfans_benchmark_")
+    try:
+        write_config(work_dir_path, args.use_async)
+        usernames = [f"user{i}" for i in range(1, args.creators + 1)]
+        start_time = time.perf_counter()
+        subprocess.run(
+            [sys.executable, path.join(ROOT_DIR_PATH, "main.py"), *usernames],
+            cwd=work_dir_path,
+            env={**os.environ, "MYFANS_API_BASE": server.api_base_url},
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        elapsed = time.perf_counter() - start_time
+        peak_rss_mib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        with open(path.join(work_dir_path, METRICS_FILENAME)) as f:
+            metrics = json.load(f)
+    finally:
+        server.stop()
+        if args.keep:
+            print(f"Kept downloads in {work_dir_path}")
+        else:
+            shutil.rmtree(work_dir_path)
+
+    post_count = get_post_count(metrics)
+    transferred_mib = get_transferred_size(metrics) / 1024 / 1024
+    print(
+        f"{args.creators} creators x {args.posts} posts "
+        f"({'async' if args.use_async else 'sync'}): {elapsed:.2f}s"
+    )
+    print(f"Posts: {post_count} ({post_count / elapsed:.1f} posts/s)")
+    print(
+        f"Transferred: {transferred_mib:.1f} MiB ({transferred_mib / elapsed:.2f} MiB/s)"
+    )
+    print(f"Peak RSS: {peak_rss_mib:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
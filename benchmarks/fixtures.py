@@ -0,0 +1,259 @@
+from typing import Any, Optional
+
+
+def get_user_basic(base_url: str, i: int) -> dict[str, Any]:
+    return {
+        "about": f"about user {i}",
+        "active": True,
+        "avatar_url": f"{base_url}/images/users/{i}/avatar.jpg",
+        "banner_url": f"{base_url}/images/users/{i}/banner.jpg",
+        "id": f"user{i:04d}",
+        "is_following": False,
+        "likes_count": 1,
+        "name": f"User {i}",
+        "username": f"user{i}",
+    }
+
+
+def get_user_in_list(base_url: str, i: int) -> dict[str, Any]:
+    return {
+        **get_user_basic(base_url, i),
+        "is_official_creator": False,
+        "is_official": False,
+        "label": None,
+        "current_back_number_plan": None,
+    }
+
+
+def get_user(base_url: str, i: int, posts_count: int) -> dict[str, Any]:
+    return {
+        **get_user_in_list(base_url, i),
+        "cant_receive_message": False,
+        "back_number_post_images_count": 0,
+        "back_number_post_videos_count": 0,
+        "followers_count": 0,
+        "followings_count": 0,
+        "has_approved_user_identification": True,
+        "is_bought_back_number": False,
+        "is_followed": False,
+        "is_subscribed": True,
+        "limited_posts_count": 0,
+        "link_instagram_id": "",
+        "link_instagram_url": None,
+        "link_tiktok_id": "",
+        "link_tiktok_url": None,
+        "link_twitter_id": "",
+        "link_twitter_url": None,
+        "link_youtube_url": "",
+        "post_images_count": 0,
+        "post_videos_count": posts_count,
+        "posts_count": posts_count,
+        "sns_link1": "",
+        "sns_link2": "",
+    }
+
+
+def get_account(base_url: str, posts_count: int) -> dict[str, Any]:
+    return {
+        **get_user(base_url, 0, posts_count),
+        "appeal_image_urls": [],
+        "birthday": None,
+        "comment_permission": "",
+        "disallow_receive_message": False,
+        "email": "",
+        "full_name": None,
+        "has_hd_access": True,
+        "has_spending_cap": False,
+        "is_confirmed": True,
+        "is_creater": False,
+        "personal_info_status": "",
+        "phone_number": None,
+        "phone_number_verified": False,
+        "postable_status": "",
+    }
+
+
+def get_plan_id(i: int, k: int = 0) -> str:
+    return f"plan{i:04d}{k:02d}"
+
+
+def get_plan(base_url: str, i: int, posts_count: int, k: int = 0) -> dict[str, Any]:
+    return {
+        "id": get_plan_id(i, k),
+        "product_name": f"Plan {i}.{k}",
+        "monthly_price": 500,
+        "status": "active",
+        "is_limited_access": False,
+        "disallow_new_subscriber": False,
+        "active_discount": None,
+        "description": "",
+        "flag": None,
+        "posts_count": posts_count,
+        "user": {**get_user_basic(base_url, i), "cant_receive_message": None},
+        "is_back_number": False,
+        "welcome_message": "",
+        "plan_discounts": None,
+    }
+
+
+def get_plan_in_post_from_list(base_url: str, i: int) -> dict[str, Any]:
+    plan = get_plan(base_url, i, 0)
+    return {
+        k: plan[k]
+        for k in (
+            "id",
+            "product_name",
+            "monthly_price",
+            "status",
+            "is_limited_access",
+            "disallow_new_subscriber",
+            "active_discount",
+        )
+    }
+
+
+def get_plan_in_post(base_url: str, i: int, posts_count: int) -> dict[str, Any]:
+    plan = get_plan(base_url, i, posts_count)
+    for k in ("active_discount", "is_back_number", "welcome_message", "plan_discounts"):
+        plan.pop(k)
+    return plan
+
+
+def get_plan_in_subscription(base_url: str, i: int, posts_count: int) -> dict[str, Any]:
+    return {
+        **get_plan(base_url, i, posts_count),
+        "active_user_subscriptions_count": 1,
+        "message_room_id": None,
+    }
+
+
+def get_subscription(base_url: str, i: int, posts_count: int) -> dict[str, Any]:
+    return {
+        "id": f"subscription{i:04d}",
+        "status": "active",
+        "active_until": "2099-12-31",
+        "active_until_i18n": "2099-12-31",
+        "active_until_for_user_i18n": "2099-12-31",
+        "created_at": "2024-01-01T00:00:00+09:00",
+        "humanized_created_at": None,
+        "user": get_user(base_url, i, posts_count),
+        "kind_i18n": "",
+        "amount": 500,
+        "creator_fee": None,
+        "web_path": f"/users/user{i}",
+        "sort": None,
+        "contracted_price": 500,
+        "plan": get_plan_in_subscription(base_url, i, posts_count),
+    }
+
+
+def get_post_id(i: int, j: int) -> str:
+    return f"post{i:04d}{j:06d}"
+
+
+def get_video(
+    base_url: str, i: int, j: int, k: int, duration_ms: int = 10000
+) -> dict[str, Any]:
+    return {
+        "url": f"{base_url}/videos/{i}/{j}/v{k}{get_post_id(i, j)}.m3u8",
+        "image_url": f"{base_url}/images/posts/{i}/{j}/video{k}.jpg",
+        "resolution": "fhd",
+        "duration_ms": duration_ms,
+        "width": 1920,
+        "height": 1080,
+    }
+
+
+def get_post_videos(base_url: str, i: int, j: int) -> dict[str, Any]:
+    return {
+        "trial": [get_video(base_url, i, j, 0, 5000)],
+        "main": [get_video(base_url, i, j, 1, 10000 + j % 10 * 1000)],
+    }
+
+
+def get_post_image(base_url: str, i: int, j: int) -> dict[str, Any]:
+    return {
+        "file_url": f"{base_url}/images/posts/{i}/{j}/file.jpg",
+        "square_thumbnail_url": f"{base_url}/images/posts/{i}/{j}/square.jpg",
+        "raw_image_height": 1080,
+        "raw_image_width": 1920,
+    }
+
+
+def get_post_basic(base_url: str, i: int, j: int) -> dict[str, Any]:
+    return {
+        "id": get_post_id(i, j),
+        "kind": "video",
+        "status": "published",
+        "status_label": None,
+        "body": f"body of post {j} by user {i}",
+        "likes_count": j % 100,
+        "published_at": f"2024-{1 + j // 28 % 12:02d}-{1 + j % 28:02d}T00:00:00+09:00",
+        "publish_end_at": None,
+        "pinned_at": None,
+        "deleted_at_i18n": None,
+        "visible": True,
+        "available": True,
+        "bookmarked": False,
+        "liked": False,
+        "attachment": None,
+        "metadata": {"video": {"duration": 10 + j % 10, "resolutions": ["fhd"]}},
+        "thumbnail_url": f"{base_url}/images/posts/{i}/{j}/thumbnail.jpg",
+    }
+
+
+def get_post_from_list(base_url: str, i: int, j: int) -> dict[str, Any]:
+    return {
+        **get_post_basic(base_url, i, j),
+        "humanized_publish_start_at": "",
+        "user": get_user_in_list(base_url, i),
+        "post_images": [get_post_image(base_url, i, j)],
+        "publish_start_at": None,
+        "plan": get_plan(base_url, i, 0),
+        "current_single_plan": None,
+        "plans": [get_plan_in_post_from_list(base_url, i)],
+        "video_processing": False,
+        "video_duration": {"hours": None, "minutes": None, "seconds": 10 + j % 10},
+        "free": j % 2 == 0,
+        "limited": False,
+    }
+
+
+def get_post(base_url: str, i: int, j: int) -> dict[str, Any]:
+    return {
+        **get_post_basic(base_url, i, j),
+        "comments_count": 0,
+        "bookmarks_count": 0,
+        "deleted_at": None,
+        "user": {**get_user_basic(base_url, i), "cant_receive_message": None},
+        "post_image": get_post_image(base_url, i, j),
+        "videos": get_post_videos(base_url, i, j),
+        "images": [
+            {
+                "height": 1080,
+                "width": 1920,
+                "url": f"{base_url}/images/posts/{i}/{j}/image.jpg",
+            }
+        ],
+        "plans": [get_plan_in_post(base_url, i, 0)],
+        "commentable": True,
+        "main_video_info": None,
+        "single_plan": None,
+    }
+
+
+def get_post_tags(j: int) -> list[dict[str, Any]]:
+    return [{"id": f"tag{j % 5}", "name": f"tag {j % 5}", "posts_count": 1}]
+
+
+def get_paged_data[T](items: list[T], page: int, per_page: int) -> dict[str, Any]:
+    start = (page - 1) * per_page
+    next_page: Optional[int] = page + 1 if start + per_page < len(items) else None
+    return {
+        "data": items[start : start + per_page],
+        "pagination": {
+            "current": page,
+            "next": next_page,
+            "previous": page - 1 if page > 1 else None,
+        },
+    }
@@ -0,0 +1,138 @@
+import re
+from collections.abc import Callable
+from copy import copy
+from datetime import datetime
+from functools import reduce
+from os import path
+from typing import Any, Optional, Sequence, cast
+
+from pathvalidate import sanitize_filename
+
+from config import Config
+from location import (
+    DataDictType,
+    PydanticModel,
+    get_key_path_type_in_models,
+    is_type_or_its_optional,
+    parse_str_methods,
+    template_pattern,
+)
+
+
+def make_location_generator(template: str) -> Callable[[DataDictType], str]:
+
+    replacer_dict: dict[str, Callable[[DataDictType], str]] = {}
+
+    for match in template_pattern.finditer(template):
+        key_path: Optional[str] = match.group("key_path")
+        pattern = m if (m := match.group("pattern")) and type(m) is str else ""
+        default = m if (m := match.group("default")) and type(m) is str else ""
+        if key_path is None:
+            continue
+
+        key_path_type = get_key_path_type_in_models(key_path)
+
+        def create_replacer(
+            key_path: str = key_path,
+            pattern: str = pattern,
+            default: str = default,
+        ) -> Callable[[DataDictType], str]:
+
+            def value_getter(data_dict: DataDictType, key_path: str) -> Any:
+                return reduce(
+                    lambda d, k: (
+                        cast(list[Any], d)[int(k)] if isinstance(d, Sequence) else d[k]
+                    ),
+                    key_path.split("."),
+                    data_dict,
+                )
+
+            if is_type_or_its_optional(key_path_type, [bool]):
+                pattern = pattern or f"{key_path}=true,{key_path}=false"
+                true_value, false_value = pattern.split(",")
+
+                def replacer(data_dict: DataDictType) -> str:
+                    value: Optional[bool] = value_getter(data_dict, key_path)
+                    if value is None:
+                        return default
+                    return true_value if value else false_value
+
+            elif is_type_or_its_optional(key_path_type, [int, float]):
+                if pattern != "":
+                    pattern = f"{{:{pattern}}}"
+                else:
+                    pattern = "{}"
+
+                def replacer(data_dict: DataDictType) -> str:
+                    value: Optional[int | float] = value_getter(data_dict, key_path)
+                    if value is None:
+                        return default
+                    return pattern.format(value)
+
+            elif is_type_or_its_optional(key_path_type, [str]):
+                methods = parse_str_methods(pattern)
+
+                def replacer(data_dict: DataDictType) -> str:
+                    value: Optional[str] = value_getter(data_dict, key_path)
+                    if value is None:
+                        return default
+                    for method in methods:
+                        value = method(value)
+                    return re.sub(r"\s+", " ", sanitize_filename(value, " ")).strip()
+
+            elif is_type_or_its_optional(key_path_type, [datetime]):
+                if pattern == "":
+                    pattern = "%Y.%m.%d"
+
+                def replacer(data_dict: DataDictType) -> str:
+                    value: Optional[datetime] = value_getter(data_dict, key_path)
+                    if value is None:
+                        return default
+                    return value.strftime(pattern)
+
+            else:
+                raise ValueError(f"Unsupported type: {key_path_type}")
+
+            return replacer
+
+        replacer_dict[match.group(0)] = create_replacer(key_path, pattern, default)
+
+    def location_generator(data_dict: DataDictType) -> str:
+        location = template
+        for match, replacer in replacer_dict.items():
+            location = location.replace(
+                match, sanitize_filename(replacer(data_dict), "_")
+            )
+        return location
+
+    return location_generator
+
+
+class LegacyLocationGetter:
+    def __init__(self, config: Config) -> None:
+        self.__downloads_dir_path_generator = make_location_generator(
+            config.download.dir_path
+        )
+        self.__post_dir_path_generator = make_location_generator(
+            config.download.post.dir_path
+        )
+        self.__data_dict: DataDictType = {}
+
+    def update_data_dict(self, key: str, model: PydanticModel) -> None:
+        if isinstance(model, dict):
+            dumped = {k: v.model_dump() for k, v in model.items()}
+        elif isinstance(model, Sequence):
+            dumped = [v.model_dump() for v in model]
+        else:
+            dumped = model.model_dump()
+        self.__data_dict[key] = dumped
+
+    def fork(self) -> "LegacyLocationGetter":
+        forked = copy(self)
+        forked.__data_dict = dict(self.__data_dict)
+        return forked
+
+    def get_post_dir_path(self) -> str:
+        download_dir_path = self.__downloads_dir_path_generator(self.__data_dict)
+        post_dir_path = self.__post_dir_path_generator(self.__data_dict)
+        return path.join(download_dir_path, post_dir_path)
@@ -0,0 +1,91 @@
+import argparse
+import time
+
+import models
+from benchmarks import fixtures
+from benchmarks.legacy_location import LegacyLocationGetter
+from config import (
+    AuthConfig,
+    Config,
+    DownloadConfig,
+    RequestConfig,
+)
+from location import LocationGetter
+
+BASE_URL = "https://example.com"
+
+
+PostDetails = tuple[
+    models.PostFromListModel,
+    models.PostModel,
+    list[models.PostTagModel],
+    models.PostVideosModel,
+]
+
+
+def measure_post_dir_paths(
+    location_getter: LocationGetter | LegacyLocationGetter,
+    post_details: list[PostDetails],
+    posts_count: int,
+) -> tuple[float, list[str]]:
+    paths: list[str] = []
+    start_time = time.perf_counter()
+    for i in range(posts_count):
+        post_from_list, post, post_tags, post_videos = post_details[
+            i % len(post_details)
+        ]
+        post_location_getter = location_getter.fork()
+        post_location_getter.update_data_dict("post_from_list", post_from_list)
+        post_location_getter.update_data_dict("post", post)
+        post_location_getter.update_data_dict("post_tags", post_tags)
+        post_location_getter.update_data_dict("post_videos", post_videos)
+        paths.append(post_location_getter.get_post_dir_path())
+    return time.perf_counter() - start_time, paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure post directory path generation"
+    )
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--distinct-posts", type=int, default=10000)
+    args = parser.parse_args()
+
+    config = Config(
+        request=RequestConfig(),
+        auth=AuthConfig(),
+        download=DownloadConfig(),
+    )
+    user = models.UserModel(**fixtures.get_user(BASE_URL, 1, args.posts))
+    location_getter = LocationGetter(config)
+    location_getter.update_data_dict("user", user)
+    legacy_location_getter = LegacyLocationGetter(config)
+    legacy_location_getter.update_data_dict("user", user)
+    post_details: list[PostDetails] = [
+        (
+            models.PostFromListModel(**fixtures.get_post_from_list(BASE_URL, 1, j)),
+            models.PostModel(**fixtures.get_post(BASE_URL, 1, j)),
+            models.post_tags_adapter.validate_python(fixtures.get_post_tags(j)),
+            models.PostVideosModel(**fixtures.get_post_videos(BASE_URL, 1, j)),
+        )
+        for j in range(args.distinct_posts)
+    ]
+
+    path_time, paths = measure_post_dir_paths(location_getter, post_details, args.posts)
+    legacy_path_time, legacy_paths = measure_post_dir_paths(
+        legacy_location_getter, post_details, args.posts
+    )
+    if paths != legacy_paths:
+        raise AssertionError("Post paths differ from the legacy implementation")
+
+    print(f"{args.posts} post paths: {path_time:.2f}s ({args.posts / path_time:.0f}/s)")
+    print(
+        f"Legacy dict-based paths: {legacy_path_time:.2f}s "
+        f"({args.posts / legacy_path_time:.0f}/s, "
+        f"{legacy_path_time / path_time:.1f}x slower)"
+    )
+    print(f"Example: {paths[0]}")
+
+
+if __name__ == "__main__":
+    main()
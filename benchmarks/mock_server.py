@@ -0,0 +1,294 @@
+import argparse
+import json
+import random
+import re
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any, Callable, Optional, cast
+from urllib.parse import parse_qs, urlparse
+
+from pydantic import BaseModel
+
+from benchmarks import fixtures
+
+IMAGE_LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+WRITE_CHUNK_SIZE = 64 * 1024
+VARIANTS = [(360, 640, 800000), (1080, 1920, 5000000)]
+
+
+class MockServerConfig(BaseModel):
+    creator_count: int = 4
+    post_count: int = 50
+    plan_count: int = 1
+    latency: float = 0.0
+    bandwidth: Optional[float] = None
+    error_rate: float = 0.0
+    error_status: int = 503
+    image_size: int = 64 * 1024
+    segment_count: int = 5
+    segment_size: int = 256 * 1024
+    segment_format: str = "fmp4"
+
+
+def parse_user_index(value: str) -> Optional[int]:
+    if (m := re.fullmatch(r"user(\d+)", value)) is None:
+        return None
+    return int(m[1])
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, config: MockServerConfig) -> None:
+        super().__init__((host, port), MockRequestHandler)
+        self.config = config
+        self.first_request_at: Optional[float] = None
+        self.__thread: Optional[Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    @property
+    def api_base_url(self) -> str:
+        return f"{self.base_url}/api"
+
+    def start(self) -> None:
+        self.__thread = Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock_server(self) -> MockServer:
+        return cast(MockServer, self.server)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def send_body(
+        self,
+        body: bytes,
+        content_type: str,
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        bandwidth = self.mock_server.config.bandwidth
+        for start in range(0, len(body), WRITE_CHUNK_SIZE):
+            chunk = body[start : start + WRITE_CHUNK_SIZE]
+            self.wfile.write(chunk)
+            if bandwidth is not None:
+                time.sleep(len(chunk) / bandwidth)
+
+    def send_empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_json(self, data: Any) -> None:
+        self.send_body(json.dumps(data).encode(), "application/json")
+
+    def do_GET(self) -> None:
+        if self.mock_server.first_request_at is None:
+            self.mock_server.first_request_at = time.monotonic()
+        config = self.mock_server.config
+        if config.latency > 0:
+            time.sleep(config.latency)
+        if random.random() < config.error_rate:
+            return self.send_empty(config.error_status)
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        for pattern, handle in self.routes:
+            if (m := re.fullmatch(pattern, url.path)) is not None:
+                return handle(self, query, *m.groups())
+        self.send_empty(404)
+
+    def get_creator_index(self, user_index: Optional[int]) -> Optional[int]:
+        if user_index is None or not (
+            1 <= user_index <= self.mock_server.config.creator_count
+        ):
+            return None
+        return user_index
+
+    def handle_account(self, query: dict[str, str]) -> None:
+        config = self.mock_server.config
+        self.send_json(
+            fixtures.get_account(self.mock_server.base_url, config.post_count)
+        )
+
+    def handle_account_subscriptions(self, query: dict[str, str]) -> None:
+        config = self.mock_server.config
+        self.send_json(
+            [
+                fixtures.get_subscription(
+                    self.mock_server.base_url, i, config.post_count
+                )
+                for i in range(1, config.creator_count + 1)
+            ]
+        )
+
+    def handle_user(self, query: dict[str, str], id: str) -> None:
+        if (i := self.get_creator_index(parse_user_index(id))) is None:
+            return self.send_empty(404)
+        config = self.mock_server.config
+        self.send_json(
+            fixtures.get_user(self.mock_server.base_url, i, config.post_count)
+        )
+
+    def handle_user_by_username(self, query: dict[str, str]) -> None:
+        username = query.get("username", "")
+        if (i := self.get_creator_index(parse_user_index(username))) is None:
+            return self.send_empty(404)
+        config = self.mock_server.config
+        self.send_json(
+            fixtures.get_user(self.mock_server.base_url, i, config.post_count)
+        )
+
+    def handle_user_plans(self, query: dict[str, str], id: str) -> None:
+        if (i := self.get_creator_index(parse_user_index(id))) is None:
+            return self.send_empty(404)
+        config = self.mock_server.config
+        self.send_json(
+            [
+                fixtures.get_plan(self.mock_server.base_url, i, config.post_count, k)
+                for k in range(config.plan_count)
+            ]
+        )
+
+    def send_posts(self, query: dict[str, str], i: int) -> None:
+        base_url = self.mock_server.base_url
+        posts = [
+            fixtures.get_post_from_list(base_url, i, j)
+            for j in reversed(range(self.mock_server.config.post_count))
+        ]
+        self.send_json(
+            fixtures.get_paged_data(
+                posts, int(query.get("page", 1)), int(query.get("per_page", 20))
+            )
+        )
+
+    def handle_user_posts(self, query: dict[str, str], id: str) -> None:
+        if (i := self.get_creator_index(parse_user_index(id))) is None:
+            return self.send_empty(404)
+        self.send_posts(query, i)
+
+    def handle_plan_posts(self, query: dict[str, str], user_index: str, _: str) -> None:
+        if (i := self.get_creator_index(int(user_index))) is None:
+            return self.send_empty(404)
+        self.send_posts(query, i)
+
+    def handle_post(
+        self, query: dict[str, str], user_index: str, post_index: str
+    ) -> None:
+        self.send_json(
+            fixtures.get_post(
+                self.mock_server.base_url, int(user_index), int(post_index)
+            )
+        )
+
+    def handle_post_tags(self, query: dict[str, str], _: str, post_index: str) -> None:
+        self.send_json(fixtures.get_post_tags(int(post_index)))
+
+    def handle_post_videos(
+        self, query: dict[str, str], user_index: str, post_index: str
+    ) -> None:
+        self.send_json(
+            fixtures.get_post_videos(
+                self.mock_server.base_url, int(user_index), int(post_index)
+            )
+        )
+
+    def handle_image(self, query: dict[str, str], image_path: str) -> None:
+        seed = image_path.encode()
+        size = self.mock_server.config.image_size
+        body = b"\xff\xd8" + (seed * (size // len(seed) + 1))[: max(0, size - 2)]
+        self.send_body(body, "image/jpeg", {"Last-Modified": IMAGE_LAST_MODIFIED})
+
+    def handle_master_playlist(self, query: dict[str, str], _: str) -> None:
+        lines = ["#EXTM3U"]
+        for height, width, bandwidth in VARIANTS:
+            lines.append(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},"
+                f"RESOLUTION={width}x{height}"
+            )
+            lines.append(f"{height}p/media.m3u8")
+        self.send_body(
+            ("\n".join(lines) + "\n").encode(), "application/vnd.apple.mpegurl"
+        )
+
+    def handle_media_playlist(self, query: dict[str, str], _: str) -> None:
+        config = self.mock_server.config
+        extension = "m4s" if config.segment_format == "fmp4" else "ts"
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            "#EXT-X-TARGETDURATION:2",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        if config.segment_format == "fmp4":
+            lines.append('#EXT-X-MAP:URI="init.mp4"')
+        for n in range(config.segment_count):
+            lines += ["#EXTINF:2.0,", f"segment{n}.{extension}"]
+        lines.append("#EXT-X-ENDLIST")
+        self.send_body(
+            ("\n".join(lines) + "\n").encode(), "application/vnd.apple.mpegurl"
+        )
+
+    def handle_segment(self, query: dict[str, str], _: str, name: str) -> None:
+        config = self.mock_server.config
+        if config.segment_format == "fmp4":
+            body = (name.encode() * (config.segment_size // len(name) + 1))[
+                : config.segment_size
+            ]
+            return self.send_body(body, "video/iso.segment")
+        self.send_body(b"\x47" + b"\xff" * 187, "video/mp2t")
+
+    routes: list[tuple[str, Callable[..., None]]] = [
+        (r"/api/v1/account", handle_account),
+        (r"/api/v1/account/subscriptions", handle_account_subscriptions),
+        (r"/api/v2/users/show_by_username", handle_user_by_username),
+        (r"/api/v1/users/([^/]+)/plans", handle_user_plans),
+        (r"/api/v1/users/([^/]+)", handle_user),
+        (r"/api/v2/users/([^/]+)/posts", handle_user_posts),
+        (r"/api/v2/plans/plan(\d{4})(\d{2})/posts", handle_plan_posts),
+        (r"/api/v2/posts/post(\d{4})(\d{6})", handle_post),
+        (r"/api/v1/posts/post(\d{4})(\d{6})/tags", handle_post_tags),
+        (r"/api/v2/posts/post(\d{4})(\d{6})/videos", handle_post_videos),
+        (r"/images/(.+)", handle_image),
+        (r"/videos/(.+)/\d+p\.m3u8", handle_master_playlist),
+        (r"/videos/(.+)/\d+p/media\.m3u8", handle_media_playlist),
+        (r"/videos/(.+)/\d+p/(init\.mp4|segment\d+\.(?:m4s|ts))", handle_segment),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local mock myfans API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for name, field in MockServerConfig.model_fields.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", default=field.default)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+    server = MockServer(host, port, MockServerConfig(**args))
+    print(f"Serving mock API at {server.api_base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+from typing import NamedTuple
+
+from benchmarks.end_to_end import ROOT_DIR_PATH, write_config
+from benchmarks.mock_server import MockServer, MockServerConfig
+from config import RequestConfig
+from user_agent import FALLBACK_USER_AGENT, CachedUserAgent, write_cached_user_agent
+
+IMPORT_TIME_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+class ImportTime(NamedTuple):
+    self_us: int
+    cumulative_us: int
+    module: str
+
+
+def get_import_times() -> tuple[ImportTime, list[ImportTime]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT_DIR_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    children: list[ImportTime] = []
+    for line in result.stderr.splitlines():
+        if (m := IMPORT_TIME_PATTERN.match(line)) is None:
+            continue
+        import_time = ImportTime(int(m[1]), int(m[2]), m[4])
+        match len(m[3]):
+            case 0 if import_time.module == "main":
+                return import_time, children
+            case 0:
+                children = []
+            case 2:
+                children.append(import_time)
+    raise RuntimeError("main was not imported")
+
+
+def measure_time_to_first_request(server: MockServer) -> tuple[float, bool]:
+    work_dir_path = tempfile.mkdtemp(prefix="myfans_startup_")
+    try:
+        write_config(work_dir_path)
+        config_file_path = path.join(work_dir_path, "config.toml")
+        config_mtime = os.stat(config_file_path).st_mtime_ns
+        write_cached_user_agent(
+            path.join(work_dir_path, RequestConfig().user_agent_cache_file_path),
+            CachedUserAgent(FALLBACK_USER_AGENT, time.time() + 3600),
+        )
+        server.first_request_at = None
+        start_time = time.monotonic()
+        subprocess.run(
+            [sys.executable, path.join(ROOT_DIR_PATH, "main.py"), "user1"],
+            cwd=work_dir_path,
+            env={**os.environ, "MYFANS_API_BASE": server.api_base_url},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        if server.first_request_at is None:
+            raise RuntimeError("main.py made no API request")
+        is_config_rewritten = os.stat(config_file_path).st_mtime_ns != config_mtime
+        return server.first_request_at - start_time, is_config_rewritten
+    finally:
+        shutil.rmtree(work_dir_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure import time and time to the first API request"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    main_import_time, child_import_times = get_import_times()
+    print(f"import main: {main_import_time.cumulative_us / 1000:.1f}ms")
+    for t in sorted(child_import_times, key=lambda t: -t.cumulative_us)[: args.top]:
+        print(f"  {t.module}: {t.cumulative_us / 1000:.1f}ms")
+
+    server = MockServer(
+        "127.0.0.1",
+        0,
+        MockServerConfig(creator_count=1, post_count=1, segment_count=1),
+    )
+    server.start()
+    try:
+        results = [measure_time_to_first_request(server) for _ in range(args.runs)]
+    finally:
+        server.stop()
+    first_request_times = [t for t, _ in results]
+    median = statistics.median(first_request_times)
+    print(
+        f"Time to first request: median {median:.3f}s, "
+        f"min {min(first_request_times):.3f}s, max {max(first_request_times):.3f}s"
+    )
+    print(f"config.toml rewritten: {any(r for _, r in results)}")
+    if median > args.budget:
+        print(f"Over budget of {args.budget:.3f}s")
+        sys.exit(1)
+    print(f"Within budget of {args.budget:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from pydantic import TypeAdapter
+
+import models
+from benchmarks import fixtures
+
+BASE_URL = "https://example.com"
+
+
+def get_paged_posts_contents(
+    user_count: int, posts_per_page: int, page_count: int
+) -> list[bytes]:
+    return [
+        json.dumps(
+            fixtures.get_paged_data(
+                [
+                    fixtures.get_post_from_list(BASE_URL, i, j)
+                    for j in range(posts_per_page * page_count)
+                ],
+                page,
+                posts_per_page,
+            )
+        ).encode()
+        for i in range(user_count)
+        for page in range(1, page_count + 1)
+    ]
+
+
+def validate_paged_posts_from_dict(content: bytes) -> Any:
+    return models.PagedDataModel[models.PostFromListModel](**json.loads(content))
+
+
+def validate_paged_posts_from_bytes(content: bytes) -> Any:
+    return models.PagedPostsFromListModel.model_validate_json(content)
+
+
+def validate_post_tags_from_dict(content: bytes) -> Any:
+    return TypeAdapter(list[models.PostTagModel]).validate_python(json.loads(content))
+
+
+def validate_post_tags_from_bytes(content: bytes) -> Any:
+    return models.post_tags_adapter.validate_json(content)
+
+
+def measure(
+    name: str, function: Callable[[bytes], Any], contents: list[bytes], repeat: int
+) -> float:
+    for content in contents[:1]:
+        function(content)
+    cpu_times: list[float] = []
+    for _ in range(repeat):
+        start_time = time.process_time()
+        for content in contents:
+            function(content)
+        cpu_times.append(time.process_time() - start_time)
+    tracemalloc.start()
+    for content in contents:
+        function(content)
+    allocated_size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cpu_time = min(cpu_times)
+    print(
+        f"{name}: {cpu_time * 1000:.1f} ms CPU, "
+        f"{cpu_time / len(contents) * 1e6:.0f} µs/payload, "
+        f"{peak_size / 1024:.0f} KiB peak allocated"
+    )
+    return cpu_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare dict-based and bytes-based validation of API responses"
+    )
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--posts-per-page", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paged_posts_contents = get_paged_posts_contents(
+        args.users, args.posts_per_page, args.pages
+    )
+    print(
+        f"{len(paged_posts_contents)} pages of {args.posts_per_page} posts, "
+        f"{sum(map(len, paged_posts_contents)) / 1024 / 1024:.1f} MiB of JSON"
+    )
+    old_time = measure(
+        "json.loads + Model(**)",
+        validate_paged_posts_from_dict,
+        paged_posts_contents,
+        args.repeat,
+    )
+    new_time = measure(
+        "model_validate_json",
+        validate_paged_posts_from_bytes,
+        paged_posts_contents,
+        args.repeat,
+    )
+    print(f"Paged posts speedup: {old_time / new_time:.2f}x")
+
+    post_tags_contents = [
+        json.dumps(fixtures.get_post_tags(j)).encode() for j in range(10000)
+    ]
+    print(f"{len(post_tags_contents)} post tag lists")
+    old_time = measure(
+        "TypeAdapter per call + validate_python",
+        validate_post_tags_from_dict,
+        post_tags_contents,
+        args.repeat,
+    )
+    new_time = measure(
+        "module-level TypeAdapter + validate_json",
+        validate_post_tags_from_bytes,
+        post_tags_contents,
+        args.repeat,
+    )
+    print(f"Post tags speedup: {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
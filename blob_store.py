@@ -0,0 +1,100 @@
+import errno
+import os
+import shutil
+from os import path
+from threading import Lock
+from typing import Literal, NamedTuple
+from uuid import uuid4
+
+FICLONE = 0x40049409
+
+LinkMode = Literal["hardlink", "reflink", "copy"]
+link_modes: list[LinkMode] = ["hardlink", "reflink", "copy"]
+is_reflink_supported = os.name == "posix"
+
+
+class Blob(NamedTuple):
+    sha256: str
+    size: int
+    file_path: str
+
+
+def reflink(source_file_path: str, target_file_path: str) -> None:
+    import fcntl
+
+    with open(source_file_path, "rb") as src, open(target_file_path, "xb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target_file_path)
+            raise
+
+
+class BlobStore:
+    def __init__(self, dir_path: str, link_mode: LinkMode) -> None:
+        self.dir_path = dir_path
+        self.__incoming_dir_path = path.join(dir_path, "incoming")
+        os.makedirs(self.__incoming_dir_path, exist_ok=True)
+        self.__link_modes = [
+            m
+            for m in link_modes[link_modes.index(link_mode) :]
+            if m != "reflink" or is_reflink_supported
+        ]
+        self.__lock = Lock()
+        self.downloaded_size = 0
+        self.reused_size = 0
+        self.placed_size = 0
+        self.stored_size = 0
+
+    def get_incoming_file_path(self) -> str:
+        return path.join(self.__incoming_dir_path, uuid4().hex)
+
+    def add(self, incoming_file_path: str, sha256: str, size: int) -> Blob:
+        blob_file_path = path.join(self.dir_path, sha256[:2], sha256)
+        os.makedirs(path.dirname(blob_file_path), exist_ok=True)
+        blob = Blob(sha256, size, blob_file_path)
+        with self.__lock:
+            self.downloaded_size += size
+            if path.exists(blob_file_path):
+                os.remove(incoming_file_path)
+            else:
+                os.replace(incoming_file_path, blob_file_path)
+                self.stored_size += size
+        return blob
+
+    def reuse(self, blob: Blob) -> None:
+        with self.__lock:
+            self.reused_size += blob.size
+
+    def place(self, blob: Blob, file_path: str) -> LinkMode:
+        dir_path, filename = path.split(file_path)
+        temp_file_path = path.join(dir_path, f".{filename}.{uuid4().hex[:8]}.part")
+        for link_mode in self.__link_modes:
+            try:
+                match link_mode:
+                    case "hardlink":
+                        os.link(blob.file_path, temp_file_path)
+                    case "reflink":
+                        reflink(blob.file_path, temp_file_path)
+                    case "copy":
+                        shutil.copy2(blob.file_path, temp_file_path)
+            except OSError as e:
+                if link_mode == "copy" or e.errno == errno.ENOENT:
+                    raise
+                continue
+            os.replace(temp_file_path, file_path)
+            with self.__lock:
+                self.placed_size += blob.size
+                if link_mode == "copy":
+                    self.stored_size += blob.size
+            return link_mode
+        raise ValueError(f"No link mode available for {file_path}")
+
+    def get_summary(self) -> str:
+        saved_size = self.placed_size - self.stored_size
+        return (
+            f"Blob store: {self.downloaded_size / 1024 / 1024:.1f} MiB downloaded, "
+            f"{self.reused_size / 1024 / 1024:.1f} MiB of downloads saved, "
+            f"{saved_size / 1024 / 1024:.1f} MiB of disk saved"
+        )
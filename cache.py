@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+from os import path
+from threading import Lock
+from typing import NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+endpoint_class_dict: dict[str, str] = {
+    "get_account": "account",
+    "get_account_subscriptions": "account",
+    "get_user": "user",
+    "get_user_by_username": "user",
+    "get_user_plans": "user",
+    "get_user_posts": "listing",
+    "get_plan_posts": "listing",
+    "get_post": "post",
+    "get_post_tags": "post",
+    "get_post_videos": "post",
+}
+
+
+class CachedResponse(NamedTuple):
+    is_fresh: bool
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        file_path: str,
+        identity: str,
+        max_size: int,
+        ttl_seconds_dict: dict[str, int],
+    ) -> None:
+        if (dir_path := path.dirname(file_path)) != "":
+            os.makedirs(dir_path, exist_ok=True)
+        self.hit_count = 0
+        self.miss_count = 0
+        self.revalidated_count = 0
+        self.__identity = hashlib.sha256(identity.encode()).hexdigest()
+        self.__max_size = max_size
+        self.__ttl_seconds_dict = ttl_seconds_dict
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(
+            file_path, check_same_thread=False, isolation_level=None
+        )
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(SCHEMA)
+        self.__total_size: int = self.__connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get_key(self, url: str) -> str:
+        return hashlib.sha256(f"{self.__identity}\n{url}".encode()).hexdigest()
+
+    def get(self, endpoint: str, key: str) -> Optional[CachedResponse]:
+        ttl = self.__ttl_seconds_dict.get(endpoint_class_dict.get(endpoint, ""), 0)
+        now = time.time()
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT stored_at, etag, last_modified, body FROM responses"
+                " WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.miss_count += 1
+                return None
+            stored_at, etag, last_modified, body = row
+            is_fresh = now - stored_at < ttl
+            if is_fresh:
+                self.hit_count += 1
+                self.__connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+            else:
+                self.miss_count += 1
+        return CachedResponse(is_fresh, etag, last_modified, zlib.decompress(body))
+
+    def revalidate(self, key: str) -> None:
+        now = time.time()
+        with self.__lock:
+            self.revalidated_count += 1
+            self.__connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        compressed_body = zlib.compress(body)
+        size = len(compressed_body)
+        now = time.time()
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.__total_size -= row[0]
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, stored_at, accessed_at, size, etag, last_modified, body)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, now, now, size, etag, last_modified, compressed_body),
+            )
+            self.__total_size += size
+            self.__evict()
+
+    def __evict(self) -> None:
+        while self.__total_size > self.__max_size:
+            row = self.__connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return
+            self.__connection.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self.__total_size -= row[1]
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+    def get_summary(self) -> str:
+        return (
+            f"Response cache: {self.hit_count} hits, {self.miss_count} misses, "
+            f"{self.revalidated_count} revalidated"
+        )
@@ -1,35 +1,44 @@
 import os
 from collections.abc import Iterable
 from os import path
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 
-import requests
 import toml
 from pydantic import BaseModel
 from toml import TomlEncoder
 
-LATEST_USER_AGENTS_API_URL = "https://jnrbsn.github.io/user-agents/user-agents.json"
 
-
-def get_latest_windows_chrome_user_agent() -> str:
-    user_agents: list[str] = requests.get(LATEST_USER_AGENTS_API_URL).json()
-    for user_agent in user_agents:
-        if (
-            "Windows NT" in user_agent
-            and "Chrome/" in user_agent
-            and not "Edg/" in user_agent
-        ):
-            return user_agent
-    raise ValueError("No user agent found")
+class RequestCacheConfig(BaseModel):
+    enabled: bool = False
+    file_path: str = "response_cache.sqlite3"
+    max_size_mb: int = 256
+    ttl_seconds: dict[str, int] = {
+        "account": 3600,
+        "user": 3600,
+        "listing": 300,
+        "post": 86400,
+    }
 
 
 class RequestConfig(BaseModel):
     proxy_url: Optional[str] = None
-    user_agent: str = get_latest_windows_chrome_user_agent()
+    user_agent: Optional[str] = None
+    user_agent_cache_file_path: str = "user_agent_cache.json"
+    user_agent_cache_ttl_seconds: int = 7 * 86400
+    max_connections_per_host: int = 32
+    requests_per_second: float = 5.0
+    min_requests_per_second: float = 0.5
+    max_requests_per_second: float = 50.0
+    max_concurrent_requests: int = 16
+    use_async: bool = False
     # interval_range: tuple[int, int] = (1, 5)
-    # timeout: int = 20
-    # max_retry_times: int = 10
-    # retry_interval_range: tuple[int, int] = (1, 5)
+    connect_timeout: int = 10
+    timeout: int = 20
+    max_retry_times: int = 10
+    retry_interval_range: tuple[int, int] = (1, 30)
+    circuit_breaker_failure_threshold: int = 10
+    circuit_breaker_cooldown: int = 30
+    cache: RequestCacheConfig = RequestCacheConfig()
 
 
 class AuthConfig(BaseModel):
@@ -61,20 +70,57 @@ class DownloadPostConfig(BaseModel):
     post_tags_data_filename: Optional[str] = "post_tags.json"
     post_videos_data_filename: Optional[str] = "post_videos.json"
     post_body_text_filename: Optional[str] = "post_body.txt"
+    filter: Optional[str] = None
 
 
 class DownloadConfig(BaseModel):
     dir_path: str = "myfans.jp downloads"
     need_scrape_account: bool = False
+    max_concurrent_posts: int = 4
+    max_concurrent_images: int = 8
+    max_concurrent_segments: int = 8
+    use_native_hls: bool = True
+    ffmpeg_stall_timeout: Optional[float] = 60.0
+    max_concurrent_videos: int = 2
+    post_order: Literal["round_robin", "newest_first"] = "round_robin"
+    video_priority: Literal[
+        "fifo", "shortest_first", "smallest_first", "newest_first", "oldest_first"
+    ] = "fifo"
+    manifest_filename: Optional[str] = "manifest.sqlite3"
+    blob_dir_name: Optional[str] = ".blobs"
+    blob_link_mode: Literal["hardlink", "reflink", "copy"] = "hardlink"
     account: DownloadAccountConfig = DownloadAccountConfig()
     user: DownloadUserConfig = DownloadUserConfig()
     post: DownloadPostConfig = DownloadPostConfig()
 
 
+class BandwidthConfig(BaseModel):
+    max_mib_per_second: Optional[float] = None
+    max_image_mib_per_second: Optional[float] = None
+    max_video_mib_per_second: Optional[float] = None
+    control_file_path: Optional[str] = None
+
+
+class MetricsConfig(BaseModel):
+    json_file_path: Optional[str] = None
+    prometheus_file_path: Optional[str] = None
+    export_interval: Optional[float] = None
+
+
+class WatchConfig(BaseModel):
+    interval: float = 900.0
+    jitter: float = 0.2
+    per_page: int = 20
+    max_post_attempts: int = 3
+
+
 class Config(BaseModel):
     request: RequestConfig
     auth: AuthConfig
     download: DownloadConfig
+    bandwidth: BandwidthConfig = BandwidthConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    watch: WatchConfig = WatchConfig()
 
 
 class ConfigTomlEncoder(TomlEncoder):  # type: ignore
@@ -85,7 +131,9 @@ class ConfigTomlEncoder(TomlEncoder):  # type: ignore
         return retval
 
 
-def init_config(raw_config: Optional[dict[str, Any]]) -> Config:
+def init_config(
+    raw_config: Optional[dict[str, Any]], config_text: Optional[str] = None
+) -> Config:
     if raw_config is None:
         if path.exists("config.toml"):
             os.replace("config.toml", "config.toml.bak")
@@ -93,19 +141,23 @@ def init_config(raw_config: Optional[dict[str, Any]]) -> Config:
             request=RequestConfig(),
             auth=AuthConfig(),
             download=DownloadConfig(),
+            bandwidth=BandwidthConfig(),
+            metrics=MetricsConfig(),
+            watch=WatchConfig(),
         )
     else:
         config = Config(**raw_config)
-    config_dict = config.model_dump()
-    with open("config.toml", "w") as f:
-        toml.dump(config_dict, f, encoder=ConfigTomlEncoder())
+    new_config_text = toml.dumps(config.model_dump(), encoder=ConfigTomlEncoder())
+    if new_config_text != config_text:
+        with open("config.toml", "w") as f:
+            f.write(new_config_text)
     return config
 
 
 def get_config() -> Config:
     try:
         with open("config.toml", "r") as f:
-            config_dict = toml.load(f)
-        return init_config(config_dict)
+            config_text = f.read()
+        return init_config(toml.loads(config_text), config_text)
     except Exception:
         return init_config(None)
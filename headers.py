@@ -3,6 +3,7 @@ from typing import cast
 import user_agents
 
 from config import Config
+from user_agent import resolve_user_agent
 
 chromium_browsers_dict = {
     "chrome": "Google Chrome",
@@ -12,7 +13,8 @@ chromium_browsers_dict = {
 
 
 def get_headers(config: Config) -> dict[str, str | bytes]:
-    user_agent = user_agents.parse(config.request.user_agent)
+    user_agent_str = resolve_user_agent(config.request)
+    user_agent = user_agents.parse(user_agent_str)
 
     browser = cast(user_agents.parsers.Browser, user_agent.browser)
     browser_family = cast(str, browser.family).lower()
@@ -52,6 +54,6 @@ def get_headers(config: Config) -> dict[str, str | bytes]:
         "Sec-Fetch-Dest": "empty",
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Site": "same-site",
-        "User-Agent": config.request.user_agent,
+        "User-Agent": user_agent_str,
         **get_sec_ch_ua_dict(),
     }
@@ -0,0 +1,332 @@
+import hashlib
+import os
+import re
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from os import path
+from threading import Thread
+from typing import IO, Optional, cast
+from urllib.parse import urljoin
+
+import requests
+from pydantic import BaseModel
+
+from requester import Requester
+
+attribute_pattern = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+FFMPEG_STDERR_MAX_LINES = 100
+FFMPEG_PROGRESS_KEYS = (b"total_size", b"out_time_us")
+FFMPEG_STALL_CHECK_INTERVAL = 1.0
+CHUNK_SIZE = 64 * 1024
+
+
+class UnsupportedPlaylistError(ValueError):
+    pass
+
+
+class HlsPlaylist(BaseModel):
+    url: str
+    init_segment_url: Optional[str]
+    segment_urls: list[str]
+
+
+class HlsProgress(BaseModel):
+    url: str
+    segment_count: int
+    written_segment_count: int = 0
+    written_size: int = 0
+
+
+def load_progress(file_path: str) -> Optional[HlsProgress]:
+    try:
+        with open(file_path, "rb") as f:
+            return HlsProgress.model_validate_json(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def save_progress(file_path: str, progress: HlsProgress) -> None:
+    temp_file_path = f"{file_path}.tmp"
+    with open(temp_file_path, "w") as f:
+        f.write(progress.model_dump_json())
+    os.replace(temp_file_path, file_path)
+
+
+def get_file_sha256(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def run_ffmpeg(args: list[str], stall_timeout: Optional[float] = None) -> None:
+    command = ["ffmpeg", "-nostats", "-progress", "pipe:1", *args]
+    stderr_lines: deque[bytes] = deque(maxlen=FFMPEG_STDERR_MAX_LINES)
+    progress_dict: dict[bytes, bytes] = {}
+    progressed_at = time.monotonic()
+
+    def read_progress(stdout: IO[bytes]) -> None:
+        nonlocal progressed_at
+        for line in stdout:
+            key, _, value = line.strip().partition(b"=")
+            if key in FFMPEG_PROGRESS_KEYS and progress_dict.get(key) != value:
+                progress_dict[key] = value
+                progressed_at = time.monotonic()
+
+    with subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        readers = [
+            Thread(
+                target=read_progress,
+                args=(cast(IO[bytes], process.stdout),),
+                daemon=True,
+            ),
+            Thread(
+                target=stderr_lines.extend,
+                args=(cast(IO[bytes], process.stderr),),
+                daemon=True,
+            ),
+        ]
+        for reader in readers:
+            reader.start()
+        while True:
+            try:
+                returncode = process.wait(timeout=FFMPEG_STALL_CHECK_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if (
+                    stall_timeout is None
+                    or time.monotonic() - progressed_at < stall_timeout
+                ):
+                    continue
+                process.kill()
+                process.wait()
+                for reader in readers:
+                    reader.join()
+                raise subprocess.TimeoutExpired(
+                    command, stall_timeout, stderr=b"".join(stderr_lines)
+                )
+        for reader in readers:
+            reader.join()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(
+            returncode, command, stderr=b"".join(stderr_lines)
+        )
+
+
+def parse_attributes(raw_attributes: str) -> dict[str, str]:
+    return {
+        key: value.strip('"')
+        for key, value in attribute_pattern.findall(raw_attributes)
+    }
+
+
+def parse_variant_playlist_url(url: str, text: str) -> Optional[str]:
+    best_url: Optional[str] = None
+    best_bandwidth = -1
+    lines = [line.strip() for line in text.splitlines() if line.strip() != ""]
+    for line, next_line in zip(lines, lines[1:]):
+        if not line.startswith("#EXT-X-STREAM-INF:"):
+            continue
+        attributes = parse_attributes(line.removeprefix("#EXT-X-STREAM-INF:"))
+        bandwidth = int(attributes.get("BANDWIDTH", "0"))
+        if bandwidth > best_bandwidth and not next_line.startswith("#"):
+            best_url = urljoin(url, next_line)
+            best_bandwidth = bandwidth
+    return best_url
+
+
+def parse_media_playlist(url: str, text: str) -> HlsPlaylist:
+    init_segment_url: Optional[str] = None
+    segment_urls: list[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line == "":
+            continue
+        if line.startswith("#EXT-X-KEY:"):
+            attributes = parse_attributes(line.removeprefix("#EXT-X-KEY:"))
+            if attributes.get("METHOD", "NONE") != "NONE":
+                raise UnsupportedPlaylistError(f"Encrypted playlist: {url}")
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            raise UnsupportedPlaylistError(f"Byte range playlist: {url}")
+        elif line.startswith("#EXT-X-MAP:"):
+            attributes = parse_attributes(line.removeprefix("#EXT-X-MAP:"))
+            if "BYTERANGE" in attributes:
+                raise UnsupportedPlaylistError(f"Byte range playlist: {url}")
+            init_segment_url = urljoin(url, attributes["URI"])
+        elif not line.startswith("#"):
+            segment_urls.append(urljoin(url, line))
+    if len(segment_urls) == 0:
+        raise UnsupportedPlaylistError(f"Empty playlist: {url}")
+    return HlsPlaylist(
+        url=url, init_segment_url=init_segment_url, segment_urls=segment_urls
+    )
+
+
+class HlsDownloader:
+    def __init__(self, requester: Requester) -> None:
+        self.requester = requester
+        self.__max_workers = max(1, requester.config.download.max_concurrent_segments)
+        self.__executor = ThreadPoolExecutor(max_workers=self.__max_workers)
+
+    def get_playlist(self, url: str) -> HlsPlaylist:
+        content = self.requester.policy.run(
+            "video_playlist", lambda: self.requester.get_media(url).content
+        )
+        self.requester.metrics.add(
+            "transferred_bytes_total", len(content), kind="video_playlist"
+        )
+        text = content.decode()
+        if (variant_url := parse_variant_playlist_url(url, text)) is not None:
+            return self.get_playlist(variant_url)
+        return parse_media_playlist(url, text)
+
+    def get_segment(self, url: str) -> bytes:
+        return self.requester.policy.run(
+            "video_segment", lambda: self.__get_segment_once(url)
+        )
+
+    def __get_segment_once(self, url: str) -> bytes:
+        with self.requester.get_media(url, stream=True) as resp:
+            chunks: list[bytes] = []
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                self.requester.bandwidth_limiter.consume("video", len(chunk))
+                chunks.append(chunk)
+        content = b"".join(chunks)
+        content_length = resp.headers.get("Content-Length")
+        if content_length is not None and int(content_length) != len(content):
+            raise requests.exceptions.ChunkedEncodingError(
+                f"Incomplete segment: {url}", response=resp
+            )
+        self.requester.metrics.add(
+            "transferred_bytes_total", len(content), kind="video_segment"
+        )
+        return content
+
+    def download_segments(
+        self,
+        segment_urls: list[str],
+        file_path: str,
+        progress_file_path: str,
+        progress: HlsProgress,
+    ) -> str:
+        futures: deque[Future[bytes]] = deque()
+        with open(file_path, "r+b" if path.exists(file_path) else "w+b") as f:
+            f.truncate(progress.written_size)
+            sha256 = hashlib.file_digest(f, "sha256")
+            f.seek(progress.written_size)
+
+            def write_next_segment() -> None:
+                content = futures.popleft().result()
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+                sha256.update(content)
+                progress.written_segment_count += 1
+                progress.written_size += len(content)
+                save_progress(progress_file_path, progress)
+
+            try:
+                for segment_url in segment_urls[progress.written_segment_count :]:
+                    futures.append(
+                        self.__executor.submit(self.get_segment, segment_url)
+                    )
+                    if len(futures) >= self.__max_workers * 2:
+                        write_next_segment()
+                while len(futures) > 0:
+                    write_next_segment()
+            finally:
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+        return sha256.hexdigest()
+
+    def download(self, url: str, file_path: str) -> str:
+        if self.requester.config.download.use_native_hls:
+            try:
+                return self.download_natively(url, file_path)
+            except UnsupportedPlaylistError:
+                pass
+        return self.pull(url, file_path)
+
+    def pull(self, url: str, file_path: str) -> str:
+        stall_timeout = self.requester.config.download.ffmpeg_stall_timeout
+        with self.requester.metrics.time("phase_duration_seconds", phase="ffmpeg"):
+            run_ffmpeg(
+                [
+                    "-y",
+                    *(
+                        ["-rw_timeout", str(int(stall_timeout * 1_000_000))]
+                        if stall_timeout is not None
+                        else []
+                    ),
+                    "-i",
+                    url,
+                    "-c:v",
+                    "copy",
+                    "-c:a",
+                    "copy",
+                    "-loglevel",
+                    "error",
+                    file_path,
+                ],
+                stall_timeout,
+            )
+        return get_file_sha256(file_path)
+
+    def download_natively(self, url: str, file_path: str) -> str:
+        playlist = self.get_playlist(url)
+        segment_urls = playlist.segment_urls
+        if playlist.init_segment_url is not None:
+            segment_urls = [playlist.init_segment_url, *segment_urls]
+        stream_file_path = f"{file_path}.part.stream"
+        progress_file_path = f"{file_path}.part.json"
+        remux_file_path = f"{file_path}.part"
+        progress = load_progress(progress_file_path)
+        if (
+            progress is None
+            or progress.url != playlist.url
+            or progress.segment_count != len(segment_urls)
+            or not path.exists(stream_file_path)
+            or path.getsize(stream_file_path) < progress.written_size
+        ):
+            progress = HlsProgress(url=playlist.url, segment_count=len(segment_urls))
+        sha256 = self.download_segments(
+            segment_urls, stream_file_path, progress_file_path, progress
+        )
+        try:
+            if playlist.init_segment_url is not None:
+                os.replace(stream_file_path, file_path)
+            else:
+                self.remux(stream_file_path, remux_file_path)
+                sha256 = get_file_sha256(remux_file_path)
+                os.replace(remux_file_path, file_path)
+                os.remove(stream_file_path)
+        finally:
+            if path.exists(remux_file_path):
+                os.remove(remux_file_path)
+        os.remove(progress_file_path)
+        return sha256
+
+    def remux(self, stream_file_path: str, remux_file_path: str) -> None:
+        with self.requester.metrics.time("phase_duration_seconds", phase="ffmpeg"):
+            run_ffmpeg(
+                [
+                    "-y",
+                    "-i",
+                    stream_file_path,
+                    "-c",
+                    "copy",
+                    "-f",
+                    "mp4",
+                    "-loglevel",
+                    "error",
+                    remux_file_path,
+                ],
+                self.requester.config.download.ffmpeg_stall_timeout,
+            )
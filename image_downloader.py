@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from os import path
+from threading import Lock
+from typing import IO, Optional
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from async_requester import AsyncRequester
+from blob_store import Blob, BlobStore
+from manifest import Manifest
+from metrics import ThroughputMeter
+from requester import Requester
+
+LAST_MODIFIED_PATTERN = "%a, %d %b %Y %H:%M:%S %Z"
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadedFile(BaseModel):
+    url: str
+    file_path: str
+    size: int
+    sha256: str
+
+
+def get_temp_file_path(file_path: str) -> str:
+    dir_path, filename = path.split(file_path)
+    return path.join(dir_path, f".{filename}.{uuid4().hex[:8]}.part")
+
+
+def set_last_modified(file_path: str, last_modified: Optional[str]) -> None:
+    if last_modified is None:
+        return
+    access_time = modification_time = datetime.strptime(
+        last_modified, LAST_MODIFIED_PATTERN
+    ).timestamp()
+    os.utime(file_path, (access_time, modification_time))
+
+
+def sync_file(f: IO[bytes]) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def commit_file(
+    temp_file_path: str, file_path: str, last_modified: Optional[str]
+) -> None:
+    set_last_modified(temp_file_path, last_modified)
+    os.replace(temp_file_path, file_path)
+
+
+class ImageDownloader:
+    def __init__(
+        self,
+        requester: Requester,
+        manifest: Manifest,
+        blob_store: Optional[BlobStore] = None,
+    ) -> None:
+        self.requester = requester
+        self.manifest = manifest
+        self.blob_store = blob_store
+        self.meter = ThroughputMeter()
+        self.__lock = Lock()
+        self.__blob_futures: dict[str, Future[Blob]] = {}
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max(1, requester.config.download.max_concurrent_images)
+        )
+
+    def download_image(
+        self, url: str, dir_path: str, post_id: Optional[str] = None
+    ) -> Optional[DownloadedFile]:
+        image_filename = path.basename(url)
+        image_file_path = path.join(dir_path, image_filename)
+        if self.manifest.has_media(image_file_path, url):
+            return None
+        if self.blob_store is None:
+            downloaded_file = self.requester.policy.run(
+                "image", lambda: self.__download_image_once(url, image_file_path)
+            )
+            self.meter.add(downloaded_file.size)
+            self.requester.metrics.add(
+                "transferred_bytes_total", downloaded_file.size, kind="image"
+            )
+        else:
+            blob = self.__get_blob(self.blob_store, url)
+            self.blob_store.place(blob, image_file_path)
+            downloaded_file = DownloadedFile(
+                url=url, file_path=image_file_path, size=blob.size, sha256=blob.sha256
+            )
+        self.manifest.add_media(
+            image_file_path, url, downloaded_file.size, downloaded_file.sha256, post_id
+        )
+        return downloaded_file
+
+    def __get_blob(self, blob_store: BlobStore, url: str) -> Blob:
+        with self.__lock:
+            future = self.__blob_futures.get(url)
+            is_owner = future is None
+            if future is None:
+                future = self.__blob_futures[url] = Future()
+        if not is_owner:
+            blob = future.result()
+            blob_store.reuse(blob)
+            return blob
+        try:
+            incoming_file_path = blob_store.get_incoming_file_path()
+            downloaded_file = self.requester.policy.run(
+                "image", lambda: self.__download_image_once(url, incoming_file_path)
+            )
+            self.meter.add(downloaded_file.size)
+            self.requester.metrics.add(
+                "transferred_bytes_total", downloaded_file.size, kind="image"
+            )
+            blob = blob_store.add(
+                incoming_file_path, downloaded_file.sha256, downloaded_file.size
+            )
+        except BaseException as e:
+            with self.__lock:
+                del self.__blob_futures[url]
+            future.set_exception(e)
+            raise
+        future.set_result(blob)
+        return blob
+
+    def __download_image_once(self, url: str, image_file_path: str) -> DownloadedFile:
+        temp_file_path = get_temp_file_path(image_file_path)
+        try:
+            sha256 = hashlib.sha256()
+            size = 0
+            with (
+                open(temp_file_path, "xb") as f,
+                self.requester.get_media(url, stream=True) as resp,
+            ):
+                for chunk in resp.iter_content(CHUNK_SIZE):
+                    self.requester.bandwidth_limiter.consume("image", len(chunk))
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+                sync_file(f)
+            commit_file(
+                temp_file_path, image_file_path, resp.headers.get("Last-Modified")
+            )
+        except BaseException:
+            if path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            raise
+        return DownloadedFile(
+            url=url, file_path=image_file_path, size=size, sha256=sha256.hexdigest()
+        )
+
+    def download_images(
+        self, urls: Iterable[str], dir_path: str, post_id: Optional[str] = None
+    ) -> list[DownloadedFile]:
+        futures = [
+            self.__executor.submit(
+                self.requester.metrics.run_queued,
+                "image",
+                time.monotonic(),
+                self.download_image,
+                url,
+                dir_path,
+                post_id,
+            )
+            for url in urls
+            if url != ""
+        ]
+        return [
+            downloaded_file
+            for future in futures
+            if (downloaded_file := future.result()) is not None
+        ]
+
+
+class AsyncImageDownloader:
+    def __init__(
+        self,
+        requester: AsyncRequester,
+        manifest: Manifest,
+        blob_store: Optional[BlobStore] = None,
+    ) -> None:
+        self.requester = requester
+        self.manifest = manifest
+        self.blob_store = blob_store
+        self.meter = ThroughputMeter()
+        self.__blob_tasks: dict[str, asyncio.Task[Blob]] = {}
+        self.__semaphore = asyncio.Semaphore(
+            max(1, requester.config.download.max_concurrent_images)
+        )
+
+    async def download_image(
+        self, url: str, dir_path: str, post_id: Optional[str] = None
+    ) -> Optional[DownloadedFile]:
+        image_filename = path.basename(url)
+        image_file_path = path.join(dir_path, image_filename)
+        if await asyncio.to_thread(self.manifest.has_media, image_file_path, url):
+            return None
+        if self.blob_store is None:
+            submitted_at = time.monotonic()
+            async with self.__semaphore:
+                self.requester.metrics.observe(
+                    "queue_wait_seconds", time.monotonic() - submitted_at, phase="image"
+                )
+                downloaded_file = await self.requester.run_with_policy(
+                    "image", lambda: self.__download_image_once(url, image_file_path)
+                )
+            self.meter.add(downloaded_file.size)
+            self.requester.metrics.add(
+                "transferred_bytes_total", downloaded_file.size, kind="image"
+            )
+        else:
+            blob = await self.__get_blob(self.blob_store, url)
+            await asyncio.to_thread(self.blob_store.place, blob, image_file_path)
+            downloaded_file = DownloadedFile(
+                url=url, file_path=image_file_path, size=blob.size, sha256=blob.sha256
+            )
+        await asyncio.to_thread(
+            self.manifest.add_media,
+            image_file_path,
+            url,
+            downloaded_file.size,
+            downloaded_file.sha256,
+            post_id,
+        )
+        return downloaded_file
+
+    async def __get_blob(self, blob_store: BlobStore, url: str) -> Blob:
+        task = self.__blob_tasks.get(url)
+        if task is not None:
+            blob = await task
+            blob_store.reuse(blob)
+            return blob
+        task = self.__blob_tasks[url] = asyncio.create_task(
+            self.__download_blob(blob_store, url)
+        )
+        try:
+            return await task
+        except BaseException:
+            del self.__blob_tasks[url]
+            raise
+
+    async def __download_blob(self, blob_store: BlobStore, url: str) -> Blob:
+        incoming_file_path = blob_store.get_incoming_file_path()
+        submitted_at = time.monotonic()
+        async with self.__semaphore:
+            self.requester.metrics.observe(
+                "queue_wait_seconds", time.monotonic() - submitted_at, phase="image"
+            )
+            downloaded_file = await self.requester.run_with_policy(
+                "image", lambda: self.__download_image_once(url, incoming_file_path)
+            )
+        self.meter.add(downloaded_file.size)
+        self.requester.metrics.add(
+            "transferred_bytes_total", downloaded_file.size, kind="image"
+        )
+        return await asyncio.to_thread(
+            blob_store.add,
+            incoming_file_path,
+            downloaded_file.sha256,
+            downloaded_file.size,
+        )
+
+    async def __download_image_once(
+        self, url: str, image_file_path: str
+    ) -> DownloadedFile:
+        temp_file_path = get_temp_file_path(image_file_path)
+        try:
+            sha256 = hashlib.sha256()
+            size = 0
+            with await asyncio.to_thread(lambda: open(temp_file_path, "xb")) as f:
+                async with self.requester.get_media(url) as resp:
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        await self.requester.bandwidth_limiter.consume_async(
+                            "image", len(chunk)
+                        )
+                        await asyncio.to_thread(f.write, chunk)
+                        sha256.update(chunk)
+                        size += len(chunk)
+                await asyncio.to_thread(sync_file, f)
+            await asyncio.to_thread(
+                commit_file,
+                temp_file_path,
+                image_file_path,
+                resp.headers.get("Last-Modified"),
+            )
+        except BaseException:
+            if path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            raise
+        return DownloadedFile(
+            url=url, file_path=image_file_path, size=size, sha256=sha256.hexdigest()
+        )
+
+    async def download_images(
+        self, urls: Iterable[str], dir_path: str, post_id: Optional[str] = None
+    ) -> list[DownloadedFile]:
+        downloaded_files = await asyncio.gather(
+            *(
+                self.requester.metrics.run_timed_async(
+                    "image", self.download_image(url, dir_path, post_id)
+                )
+                for url in urls
+                if url != ""
+            )
+        )
+        return [
+            downloaded_file
+            for downloaded_file in downloaded_files
+            if downloaded_file is not None
+        ]
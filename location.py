@@ -1,12 +1,14 @@
 import re
 import string
 from collections.abc import Callable
+from copy import copy
 from datetime import datetime
-from functools import reduce
+from functools import lru_cache
+from operator import attrgetter, itemgetter
 from os import path
 from typing import Any, Optional, Sequence, Union, cast, get_args, get_origin
 
-from pathvalidate import sanitize_filename
+from pathvalidate import FileNameSanitizer
 from pydantic import BaseModel
 
 import models
@@ -31,6 +33,14 @@ template_pattern = re.compile(
     r"<(?P<key_path>[\w.]+)(?::(?P<pattern>[^|<>]+))?(?:\|(?P<default>[^|<>]+))?>"
 )
 str_method_pattern = re.compile(r"\.\s*(\w+)\s*\(([^()]*)\)")
+whitespace_pattern = re.compile(r"\s+")
+
+filename_sanitizer = FileNameSanitizer(max_len=255)
+
+
+@lru_cache(maxsize=4096)
+def sanitize_filename(value: str, replacement_text: str) -> str:
+    return filename_sanitizer.sanitize(value, replacement_text)
 
 
 def is_type_or_its_optional(
@@ -141,9 +151,36 @@ def parse_str_methods(raw_string: str) -> list[Callable[[str], str]]:
     return methods
 
 
+def make_value_getter(key_path: str) -> Callable[[DataDictType], Any]:
+    root_key, *keys = key_path.split(".")
+    getters: list[Callable[[Any], Any]] = [
+        itemgetter(int(key)) if set(key).issubset(string.digits) else attrgetter(key)
+        for key in keys
+    ]
+
+    def value_getter(data_dict: DataDictType) -> Any:
+        value = data_dict[root_key]
+        for getter in getters:
+            value = getter(value)
+        return value
+
+    return value_getter
+
+
+def is_constant_template(template: str) -> bool:
+    return template_pattern.search(template) is None
+
+
+def get_constant_dir_path(template: str) -> str:
+    if (match := template_pattern.search(template)) is None:
+        return make_location_generator(template)({})
+    return make_location_generator(path.dirname(template[: match.start()]))({}) or "."
+
+
 def make_location_generator(template: str) -> Callable[[DataDictType], str]:
 
-    replacer_dict: dict[str, Callable[[DataDictType], str]] = {}
+    parts: list[str | Callable[[DataDictType], str]] = []
+    last_end = 0
 
     for match in template_pattern.finditer(template):
         key_path: Optional[str] = match.group("key_path")
@@ -160,21 +197,14 @@ def make_location_generator(template: str) -> Callable[[DataDictType], str]:
             default: str = default,
         ) -> Callable[[DataDictType], str]:
 
-            def value_getter(data_dict: DataDictType, key_path: str) -> Any:
-                return reduce(
-                    lambda d, k: (
-                        cast(list[Any], d)[int(k)] if isinstance(d, Sequence) else d[k]
-                    ),
-                    key_path.split("."),
-                    data_dict,
-                )
+            value_getter = make_value_getter(key_path)
 
             if is_type_or_its_optional(key_path_type, [bool]):
                 pattern = pattern or f"{key_path}=true,{key_path}=false"
                 true_value, false_value = pattern.split(",")
 
                 def replacer(data_dict: DataDictType) -> str:
-                    value: Optional[bool] = value_getter(data_dict, key_path)
+                    value: Optional[bool] = value_getter(data_dict)
                     if value is None:
                         return default
                     return true_value if value else false_value
@@ -186,7 +216,7 @@ def make_location_generator(template: str) -> Callable[[DataDictType], str]:
                     pattern = "{}"
 
                 def replacer(data_dict: DataDictType) -> str:
-                    value: Optional[int | float] = value_getter(data_dict, key_path)
+                    value: Optional[int | float] = value_getter(data_dict)
                     if value is None:
                         return default
                     return pattern.format(value)
@@ -195,19 +225,21 @@ def make_location_generator(template: str) -> Callable[[DataDictType], str]:
                 methods = parse_str_methods(pattern)
 
                 def replacer(data_dict: DataDictType) -> str:
-                    value: Optional[str] = value_getter(data_dict, key_path)
+                    value: Optional[str] = value_getter(data_dict)
                     if value is None:
                         return default
                     for method in methods:
                         value = method(value)
-                    return re.sub(r"\s+", " ", sanitize_filename(value, " ")).strip()
+                    return whitespace_pattern.sub(
+                        " ", sanitize_filename(value, " ")
+                    ).strip()
 
             elif is_type_or_its_optional(key_path_type, [datetime]):
                 if pattern == "":
                     pattern = "%Y.%m.%d"
 
                 def replacer(data_dict: DataDictType) -> str:
-                    value: Optional[datetime] = value_getter(data_dict, key_path)
+                    value: Optional[datetime] = value_getter(data_dict)
                     if value is None:
                         return default
                     return value.strftime(pattern)
@@ -217,15 +249,19 @@ def make_location_generator(template: str) -> Callable[[DataDictType], str]:
 
             return replacer
 
-        replacer_dict[match.group(0)] = create_replacer(key_path, pattern, default)
+        parts.append(template[last_end : match.start()])
+        parts.append(create_replacer(key_path, pattern, default))
+        last_end = match.end()
+    parts.append(template[last_end:])
+
+    if len(parts) == 1:
+        return lambda _: template
 
     def location_generator(data_dict: DataDictType) -> str:
-        location = template
-        for match, replacer in replacer_dict.items():
-            location = location.replace(
-                match, sanitize_filename(replacer(data_dict), "_")
-            )
-        return location
+        return "".join(
+            (part if isinstance(part, str) else sanitize_filename(part(data_dict), "_"))
+            for part in parts
+        )
 
     return location_generator
 
@@ -236,6 +272,12 @@ class LocationGetter:
         self.__downloads_dir_path_generator = make_location_generator(
             config.download.dir_path
         )
+        self.__downloads_dir_path = (
+            self.__downloads_dir_path_generator({})
+            if is_constant_template(config.download.dir_path)
+            else None
+        )
+        self.__downloads_root_dir_path = get_constant_dir_path(config.download.dir_path)
         self.__account_dir_path_generator = make_location_generator(
             config.download.account.dir_path
         )
@@ -248,25 +290,32 @@ class LocationGetter:
         self.__data_dict: DataDictType = {}
 
     def update_data_dict(self, key: str, model: PydanticModel) -> None:
-        if isinstance(model, dict):
-            dumped = {k: v.model_dump() for k, v in model.items()}
-        elif isinstance(model, Sequence):
-            dumped = [v.model_dump() for v in model]
-        else:
-            dumped = model.model_dump()
-        self.__data_dict[key] = dumped
+        self.__data_dict[key] = model
+
+    def fork(self) -> "LocationGetter":
+        forked = copy(self)
+        forked.__data_dict = dict(self.__data_dict)
+        return forked
+
+    def get_downloads_dir_path(self) -> str:
+        if self.__downloads_dir_path is not None:
+            return self.__downloads_dir_path
+        return self.__downloads_dir_path_generator(self.__data_dict)
+
+    def get_downloads_root_dir_path(self) -> str:
+        return self.__downloads_root_dir_path
 
     def get_account_dir_path(self) -> str:
-        download_dir_path = self.__downloads_dir_path_generator(self.__data_dict)
+        download_dir_path = self.get_downloads_dir_path()
         account_dir_path = self.__account_dir_path_generator(self.__data_dict)
         return path.join(download_dir_path, account_dir_path)
 
     def get_user_dir_path(self) -> str:
-        download_dir_path = self.__downloads_dir_path_generator(self.__data_dict)
+        download_dir_path = self.get_downloads_dir_path()
         user_dir_path = self.__user_dir_path_generator(self.__data_dict)
         return path.join(download_dir_path, user_dir_path)
 
     def get_post_dir_path(self) -> str:
-        download_dir_path = self.__downloads_dir_path_generator(self.__data_dict)
+        download_dir_path = self.get_downloads_dir_path()
         post_dir_path = self.__post_dir_path_generator(self.__data_dict)
         return path.join(download_dir_path, post_dir_path)
@@ -1,17 +1,42 @@
+import argparse
+import asyncio
+import heapq
 import os
+import random
+import signal
 import subprocess
 import sys
-from datetime import datetime
+import time
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial
+from itertools import repeat
 from os import path
 from pathlib import Path
 from posixpath import join as urljoin
-from typing import Literal
+from threading import Lock
+from typing import Any, Literal, NamedTuple, Optional
 
-from pydantic import TypeAdapter
+import aiohttp
+import requests
 from tqdm import tqdm
 
-from config import get_config
+from async_requester import AsyncRequester
+from bandwidth import BandwidthLimiter
+from blob_store import BlobStore
+from config import Config, get_config
+from hls import HlsDownloader
+from image_downloader import AsyncImageDownloader, ImageDownloader
 from location import LocationGetter
+from manifest import Manifest, PostCursor
+from metrics import Metrics, MetricsExporter
 from models import (
     AccountModel,
     PlanModel,
@@ -22,34 +47,38 @@ from models import (
     PostVideosModel,
     SubscriptionModel,
     UserModel,
+    plans_adapter,
+    post_tags_adapter,
+    subscriptions_adapter,
 )
+from post_filter import PostFilter, compile_post_filter
 from requester import Requester
-
-LAST_MODIFIED_PATTERN = "%a, %d %b %Y %H:%M:%S %Z"
+from scheduler import JobReport, JobScheduler
 
 # TODO
 supported_video_resolutions = [240, 360, 480, 720, 1080, 1440, 2160]
 
+ACTIVE_SUBSCRIPTION_STATUS = "active"
+
 
-def download_image(requester: Requester, url: str, dir_path: str) -> None:
-    image_filename = path.basename(url)
-    image_file_path = path.join(dir_path, image_filename)
-    with open(image_file_path, "wb") as f:
-        resp = requester.session.get(url)
-        f.write(resp.content)
-    access_time = modification_time = datetime.strptime(
-        resp.headers["Last-Modified"], LAST_MODIFIED_PATTERN
-    ).timestamp()
-    os.utime(image_file_path, (access_time, modification_time))
+class Targets(NamedTuple):
+    usernames: list[str]
+    use_subscriptions: bool
+    plan_ids: list[str]
+    use_all_plans: bool
+    use_watch: bool
 
 
 def download_video(
     requester: Requester,
+    hls_downloader: HlsDownloader,
+    manifest: Manifest,
     video_type: Literal["trial"] | Literal["main"],
     video_index: int,
     video: PostVideoModel,
     dir_path: str,
-) -> None:
+    post_id: Optional[str] = None,
+) -> Optional[str]:
     video_url_dirname = path.dirname(video.url)
     video_url_stem = Path(video.url).stem
     video_resolution = min(
@@ -58,123 +87,190 @@ def download_video(
     video_url = urljoin(video_url_dirname, video_url_stem, f"{video_resolution}p.m3u8")
     video_filename = f"[{video_type}.{video_index:02d}] [{video_url_stem[:8]}] ({video.resolution},{video.width}×{video.height}).mp4"
     video_file_path = path.join(dir_path, video_filename)
+    if manifest.has_media(video_file_path, video_url):
+        return video_file_path
     try:
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                video_url,
-                "-c:v",
-                "copy",
-                "-c:a",
-                "copy",
-                "-loglevel",
-                "error",
-                video_file_path,
-            ],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=600,
-        )
+        sha256 = hls_downloader.download(video_url, video_file_path)
     except subprocess.CalledProcessError as e:
-        print(e.stderr.decode())
+        tqdm.write(e.stderr.decode())
+        return None
+    except (subprocess.TimeoutExpired, requests.RequestException) as e:
+        tqdm.write(str(e))
+        return None
+    manifest.add_media(
+        video_file_path, video_url, path.getsize(video_file_path), sha256, post_id
+    )
+    return video_file_path
 
 
-def download_account(
-    requester: Requester, location_getter: LocationGetter
-) -> tuple[AccountModel, list[SubscriptionModel]]:
-    account = requester.get_account()
-    account_subscriptions = requester.get_account_subscriptions()
-    location_getter.update_data_dict("account", account)
-    location_getter.update_data_dict("account_subscriptions", account_subscriptions)
+def get_video_priority(
+    config: Config, post_from_list: PostFromListModel, video: PostVideoModel
+) -> float:
+    match config.download.video_priority:
+        case "fifo":
+            return 0
+        case "shortest_first":
+            return video.duration_ms
+        case "smallest_first":
+            return video.duration_ms * video.width * video.height
+        case "newest_first":
+            return -post_from_list.published_at.timestamp()
+        case "oldest_first":
+            return post_from_list.published_at.timestamp()
 
-    dir_path = location_getter.get_account_dir_path()
-    if not path.exists(dir_path):
-        os.makedirs(dir_path)
 
-    conf = requester.config.download.account
+def call_when_all_done(
+    futures: list[Future[Any]], callback: Callable[[], None]
+) -> None:
+    remaining_count = len(futures)
+    lock = Lock()
+
+    def on_done(_: Future[Any]) -> None:
+        nonlocal remaining_count
+        with lock:
+            remaining_count -= 1
+            if remaining_count > 0:
+                return
+        callback()
+
+    if remaining_count == 0:
+        callback()
+    for future in futures:
+        future.add_done_callback(on_done)
+
+
+def interleave[T](iterables: Iterable[Iterable[T]]) -> Iterator[T]:
+    iterators = deque(iter(iterable) for iterable in iterables)
+    while len(iterators) > 0:
+        iterator = iterators.popleft()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            continue
+        yield item
+        iterators.append(iterator)
+
+
+async def async_interleave[T](
+    iterators: Iterable[AsyncIterator[T]],
+) -> AsyncIterator[T]:
+    iterator_deque = deque(iterators)
+    while len(iterator_deque) > 0:
+        iterator = iterator_deque.popleft()
+        try:
+            item = await anext(iterator)
+        except StopAsyncIteration:
+            continue
+        yield item
+        iterator_deque.append(iterator)
+
+
+def get_post_timestamp(item: tuple[PostFromListModel, LocationGetter]) -> float:
+    return item[0].published_at.timestamp()
+
+
+def order_posts(
+    config: Config, posts_list: list[Iterable[tuple[PostFromListModel, LocationGetter]]]
+) -> Iterator[tuple[PostFromListModel, LocationGetter]]:
+    match config.download.post_order:
+        case "round_robin":
+            return interleave(posts_list)
+        case "newest_first":
+            return heapq.merge(*posts_list, key=get_post_timestamp, reverse=True)
+
+
+async def async_merge_newest_first(
+    iterators: list[AsyncIterator[tuple[PostFromListModel, LocationGetter]]],
+) -> AsyncIterator[tuple[PostFromListModel, LocationGetter]]:
+    first_items = await asyncio.gather(
+        *(anext(iterator, None) for iterator in iterators)
+    )
+    heads = [
+        (-get_post_timestamp(item), i, item, iterator)
+        for i, (item, iterator) in enumerate(zip(first_items, iterators))
+        if item is not None
+    ]
+    heapq.heapify(heads)
+    while len(heads) > 0:
+        _, i, item, iterator = heads[0]
+        yield item
+        if (next_item := await anext(iterator, None)) is None:
+            heapq.heappop(heads)
+        else:
+            heapq.heapreplace(
+                heads, (-get_post_timestamp(next_item), i, next_item, iterator)
+            )
+
+
+def async_order_posts(
+    config: Config,
+    posts_list: list[AsyncIterator[tuple[PostFromListModel, LocationGetter]]],
+) -> AsyncIterator[tuple[PostFromListModel, LocationGetter]]:
+    match config.download.post_order:
+        case "round_robin":
+            return async_interleave(posts_list)
+        case "newest_first":
+            return async_merge_newest_first(posts_list)
+
+
+def write_account_files(
+    config: Config,
+    dir_path: str,
+    account: AccountModel,
+    account_subscriptions: list[SubscriptionModel],
+) -> None:
+    conf = config.download.account
     if (n := conf.account_data_filename) is not None:
         with open(path.join(dir_path, n), "w") as f:
             f.write(account.model_dump_json())
     if (n := conf.account_subscriptions_data_filename) is not None:
         with open(path.join(dir_path, n), "wb") as f:
-            f.write(
-                TypeAdapter(list[SubscriptionModel]).dump_json(account_subscriptions)
-            )
+            f.write(subscriptions_adapter.dump_json(account_subscriptions))
     if (n := conf.account_about_text_filename) is not None:
         with open(path.join(dir_path, n), "w") as f:
             f.write(account.about)
 
-    image_urls = {
+
+def get_account_image_urls(account: AccountModel) -> set[str]:
+    return {
         *account.appeal_image_urls,
         account.avatar_url,
         account.banner_url,
     }
-    for image_url in image_urls:
-        if image_url == "":
-            continue
-        download_image(requester, image_url, dir_path)
-    return account, account_subscriptions
-
-
-def download_user(
-    requester: Requester,
-    id_or_username: str,
-    by: Literal["id"] | Literal["username"],
-    location_getter: LocationGetter,
-) -> tuple[UserModel, list[PlanModel]]:
-    user = requester.get_user(id_or_username, by)
-    user_plans = requester.get_user_plans(user.id)
-    location_getter.update_data_dict("user", user)
-    location_getter.update_data_dict("user_plans", user_plans)
 
-    dir_path = location_getter.get_user_dir_path()
-    if not path.exists(dir_path):
-        os.makedirs(dir_path)
 
-    conf = requester.config.download.user
+def write_user_files(
+    config: Config, dir_path: str, user: UserModel, user_plans: list[PlanModel]
+) -> None:
+    conf = config.download.user
     if (n := conf.user_data_filename) is not None:
         with open(path.join(dir_path, n), "w") as f:
             f.write(user.model_dump_json())
     if (n := conf.user_plans_data_filename) is not None:
         with open(path.join(dir_path, n), "wb") as f:
-            f.write(TypeAdapter(list[PlanModel]).dump_json(user_plans))
+            f.write(plans_adapter.dump_json(user_plans))
 
     if (n := conf.user_about_text_filename) is not None:
         with open(path.join(dir_path, n), "w") as f:
             f.write(user.about)
 
-    image_urls = {
+
+def get_user_image_urls(user: UserModel) -> set[str]:
+    return {
         user.avatar_url,
         user.banner_url,
     }
-    for image_url in image_urls:
-        if image_url == "":
-            continue
-        download_image(requester, image_url, dir_path)
-    return user, user_plans
 
 
-def download_post(
-    requester: Requester,
+def write_post_files(
+    config: Config,
+    dir_path: str,
     post_from_list: PostFromListModel,
-    location_getter: LocationGetter,
-) -> tuple[PostModel, list[PostTagModel], PostVideosModel]:
-    post = requester.get_post(post_from_list.id)
-    post_tags = requester.get_post_tags(post_from_list.id)
-    post_videos = requester.get_post_videos(post_from_list.id)
-    location_getter.update_data_dict("post_from_list", post_from_list)
-    location_getter.update_data_dict("post", post)
-    location_getter.update_data_dict("post_tags", post_tags)
-    location_getter.update_data_dict("post_videos", post_videos)
-
-    dir_path = location_getter.get_post_dir_path()
-    if not path.exists(dir_path):
-        os.makedirs(dir_path)
-
-    conf = requester.config.download.post
+    post: PostModel,
+    post_tags: list[PostTagModel],
+    post_videos: PostVideosModel,
+) -> None:
+    conf = config.download.post
     if (n := conf.post_data_filename) is not None:
         with open(path.join(dir_path, n), "w") as f:
             f.write(post.model_dump_json())
@@ -183,7 +279,7 @@ def download_post(
             f.write(post_from_list.model_dump_json())
     if (n := conf.post_tags_data_filename) is not None:
         with open(path.join(dir_path, n), "wb") as f:
-            f.write(TypeAdapter(list[PostTagModel]).dump_json(post_tags))
+            f.write(post_tags_adapter.dump_json(post_tags))
     if (n := conf.post_videos_data_filename) is not None:
         with open(path.join(dir_path, n), "w") as f:
             f.write(post_videos.model_dump_json())
@@ -191,7 +287,11 @@ def download_post(
         with open(path.join(dir_path, n), "w") as f:
             f.write(post.body)
 
-    image_urls = {
+
+def get_post_image_urls(
+    post_from_list: PostFromListModel, post: PostModel, post_videos: PostVideosModel
+) -> set[str]:
+    return {
         post.thumbnail_url,
         post.post_image.file_url,
         *(
@@ -224,42 +324,918 @@ def download_post(
         ),
         *([video.image_url for video in post_videos.main] if post_videos.main else []),
     }
-    for image_url in image_urls:
-        if image_url == "":
-            continue
-        download_image(requester, image_url, dir_path)
 
-    if post_videos.trial is not None:
-        for i, video in enumerate(post_videos.trial):
-            download_video(requester, "trial", i, video, dir_path)
-    if post_videos.main is not None:
-        for i, video in enumerate(post_videos.main):
-            download_video(requester, "main", i, video, dir_path)
 
+def submit_post_videos(
+    requester: Requester,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    post_from_list: PostFromListModel,
+    post_videos: PostVideosModel,
+    dir_path: str,
+) -> None:
+    video_lists: list[
+        tuple[Literal["trial"] | Literal["main"], Optional[list[PostVideoModel]]]
+    ] = [("trial", post_videos.trial), ("main", post_videos.main)]
+    video_futures = [
+        video_scheduler.submit(
+            download_video,
+            requester,
+            hls_downloader,
+            manifest,
+            video_type,
+            i,
+            video,
+            dir_path,
+            post_from_list.id,
+            name=f"{post_from_list.id} {video_type}.{i:02d}",
+            priority=get_video_priority(requester.config, post_from_list, video),
+            get_size=lambda p: path.getsize(p) if p is not None else None,
+        )
+        for video_type, videos in video_lists
+        if videos is not None
+        for i, video in enumerate(videos)
+    ]
+
+    def complete_post() -> None:
+        if all(f.exception() is None and f.result() is not None for f in video_futures):
+            manifest.complete_post(post_from_list.id)
+
+    call_when_all_done(video_futures, complete_post)
+
+
+def download_account(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    location_getter: LocationGetter,
+) -> tuple[AccountModel, list[SubscriptionModel]]:
+    account = requester.get_account()
+    account_subscriptions = requester.get_account_subscriptions()
+    location_getter.update_data_dict("account", account)
+    location_getter.update_data_dict("account_subscriptions", account_subscriptions)
+
+    dir_path = location_getter.get_account_dir_path()
+    if not path.exists(dir_path):
+        os.makedirs(dir_path)
+
+    write_account_files(requester.config, dir_path, account, account_subscriptions)
+    image_downloader.download_images(get_account_image_urls(account), dir_path)
+    return account, account_subscriptions
+
+
+def download_user(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    id_or_username: str,
+    by: Literal["id"] | Literal["username"],
+    location_getter: LocationGetter,
+) -> tuple[UserModel, list[PlanModel]]:
+    user = requester.get_user(id_or_username, by)
+    user_plans = requester.get_user_plans(user.id)
+    location_getter.update_data_dict("user", user)
+    location_getter.update_data_dict("user_plans", user_plans)
+
+    dir_path = location_getter.get_user_dir_path()
+    if not path.exists(dir_path):
+        os.makedirs(dir_path)
+
+    write_user_files(requester.config, dir_path, user, user_plans)
+    image_downloader.download_images(get_user_image_urls(user), dir_path)
+    return user, user_plans
+
+
+def download_post(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    post_from_list: PostFromListModel,
+    location_getter: LocationGetter,
+) -> tuple[PostModel, list[PostTagModel], PostVideosModel]:
+    post, post_tags, post_videos = requester.get_post_details(post_from_list.id)
+    location_getter.update_data_dict("post_from_list", post_from_list)
+    location_getter.update_data_dict("post", post)
+    location_getter.update_data_dict("post_tags", post_tags)
+    location_getter.update_data_dict("post_videos", post_videos)
+
+    dir_path = location_getter.get_post_dir_path()
+    if not path.exists(dir_path):
+        os.makedirs(dir_path)
+    manifest.start_post(post_from_list.id, post_from_list.published_at, dir_path)
+
+    write_post_files(
+        requester.config, dir_path, post_from_list, post, post_tags, post_videos
+    )
+    image_downloader.download_images(
+        get_post_image_urls(post_from_list, post, post_videos),
+        dir_path,
+        post_from_list.id,
+    )
+    submit_post_videos(
+        requester,
+        hls_downloader,
+        video_scheduler,
+        manifest,
+        post_from_list,
+        post_videos,
+        dir_path,
+    )
+    return post, post_tags, post_videos
+
+
+def download_posts(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    posts: Iterable[tuple[PostFromListModel, LocationGetter]],
+    post_filter: Optional[PostFilter],
+    progress_bar: tqdm,
+) -> None:
+    max_workers = max(1, requester.config.download.max_concurrent_posts)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures: dict[
+            Future[tuple[PostModel, list[PostTagModel], PostVideosModel]],
+            PostFromListModel,
+        ] = {}
+
+        def collect(return_when: str) -> None:
+            done, _ = wait(futures, return_when=return_when)
+            for future in done:
+                post_from_list = futures.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    requester.metrics.add("posts_failed_total", 1)
+                    tqdm.write(f"{post_from_list.id}: {e}")
+                progress_bar.update(1)
+
+        seen_post_ids: set[str] = set()
+        try:
+            for post_from_list, location_getter in posts:
+                if post_filter is not None and not post_filter(post_from_list):
+                    requester.metrics.add("posts_filtered_total", 1)
+                    progress_bar.update(1)
+                    continue
+                if post_from_list.id in seen_post_ids or manifest.is_post_completed(
+                    post_from_list.id, post_from_list.published_at
+                ):
+                    progress_bar.update(1)
+                    continue
+                seen_post_ids.add(post_from_list.id)
+                if len(futures) >= max_workers * 2:
+                    collect(FIRST_COMPLETED)
+                future = executor.submit(
+                    requester.metrics.run_queued,
+                    "post",
+                    time.monotonic(),
+                    download_post,
+                    requester,
+                    image_downloader,
+                    hls_downloader,
+                    video_scheduler,
+                    manifest,
+                    post_from_list,
+                    location_getter.fork(),
+                )
+                futures[future] = post_from_list
+            collect(ALL_COMPLETED)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+async def async_download_account(
+    requester: AsyncRequester,
+    image_downloader: AsyncImageDownloader,
+    location_getter: LocationGetter,
+) -> tuple[AccountModel, list[SubscriptionModel]]:
+    account, account_subscriptions = await asyncio.gather(
+        requester.get_account(), requester.get_account_subscriptions()
+    )
+    location_getter.update_data_dict("account", account)
+    location_getter.update_data_dict("account_subscriptions", account_subscriptions)
+
+    dir_path = location_getter.get_account_dir_path()
+    await asyncio.to_thread(os.makedirs, dir_path, exist_ok=True)
+
+    await asyncio.to_thread(
+        write_account_files,
+        requester.config,
+        dir_path,
+        account,
+        account_subscriptions,
+    )
+    await image_downloader.download_images(get_account_image_urls(account), dir_path)
+    return account, account_subscriptions
+
+
+async def async_download_user(
+    requester: AsyncRequester,
+    image_downloader: AsyncImageDownloader,
+    id_or_username: str,
+    by: Literal["id"] | Literal["username"],
+    location_getter: LocationGetter,
+) -> tuple[UserModel, list[PlanModel]]:
+    user = await requester.get_user(id_or_username, by)
+    user_plans = await requester.get_user_plans(user.id)
+    location_getter.update_data_dict("user", user)
+    location_getter.update_data_dict("user_plans", user_plans)
+
+    dir_path = location_getter.get_user_dir_path()
+    await asyncio.to_thread(os.makedirs, dir_path, exist_ok=True)
+
+    await asyncio.to_thread(
+        write_user_files, requester.config, dir_path, user, user_plans
+    )
+    await image_downloader.download_images(get_user_image_urls(user), dir_path)
+    return user, user_plans
+
+
+async def async_download_post(
+    requester: AsyncRequester,
+    image_downloader: AsyncImageDownloader,
+    video_requester: Requester,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    post_from_list: PostFromListModel,
+    location_getter: LocationGetter,
+) -> tuple[PostModel, list[PostTagModel], PostVideosModel]:
+    post, post_tags, post_videos = await requester.get_post_details(post_from_list.id)
+    location_getter.update_data_dict("post_from_list", post_from_list)
+    location_getter.update_data_dict("post", post)
+    location_getter.update_data_dict("post_tags", post_tags)
+    location_getter.update_data_dict("post_videos", post_videos)
+
+    dir_path = location_getter.get_post_dir_path()
+    await asyncio.to_thread(os.makedirs, dir_path, exist_ok=True)
+    await asyncio.to_thread(
+        manifest.start_post,
+        post_from_list.id,
+        post_from_list.published_at,
+        dir_path,
+    )
+
+    await asyncio.to_thread(
+        write_post_files,
+        requester.config,
+        dir_path,
+        post_from_list,
+        post,
+        post_tags,
+        post_videos,
+    )
+    await image_downloader.download_images(
+        get_post_image_urls(post_from_list, post, post_videos),
+        dir_path,
+        post_from_list.id,
+    )
+    await asyncio.to_thread(
+        submit_post_videos,
+        video_requester,
+        hls_downloader,
+        video_scheduler,
+        manifest,
+        post_from_list,
+        post_videos,
+        dir_path,
+    )
     return post, post_tags, post_videos
 
 
+async def async_download_posts(
+    requester: AsyncRequester,
+    image_downloader: AsyncImageDownloader,
+    video_requester: Requester,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    posts: AsyncIterator[tuple[PostFromListModel, LocationGetter]],
+    post_filter: Optional[PostFilter],
+    progress_bar: tqdm,
+) -> None:
+    max_tasks = max(1, requester.config.download.max_concurrent_posts) * 2
+    tasks: dict[
+        asyncio.Task[tuple[PostModel, list[PostTagModel], PostVideosModel]],
+        PostFromListModel,
+    ] = {}
+
+    async def collect(return_when: str) -> None:
+        if len(tasks) == 0:
+            return
+        done, _ = await asyncio.wait(tasks, return_when=return_when)
+        for task in done:
+            post_from_list = tasks.pop(task)
+            try:
+                task.result()
+            except Exception as e:
+                requester.metrics.add("posts_failed_total", 1)
+                tqdm.write(f"{post_from_list.id}: {e}")
+            progress_bar.update(1)
+
+    seen_post_ids: set[str] = set()
+    try:
+        async for post_from_list, location_getter in posts:
+            if post_filter is not None and not post_filter(post_from_list):
+                requester.metrics.add("posts_filtered_total", 1)
+                progress_bar.update(1)
+                continue
+            if post_from_list.id in seen_post_ids or await asyncio.to_thread(
+                manifest.is_post_completed,
+                post_from_list.id,
+                post_from_list.published_at,
+            ):
+                progress_bar.update(1)
+                continue
+            seen_post_ids.add(post_from_list.id)
+            submitted_at = time.monotonic()
+            if len(tasks) >= max_tasks:
+                await collect(asyncio.FIRST_COMPLETED)
+            task = asyncio.create_task(
+                requester.metrics.run_queued_async(
+                    "post",
+                    submitted_at,
+                    async_download_post(
+                        requester,
+                        image_downloader,
+                        video_requester,
+                        hls_downloader,
+                        video_scheduler,
+                        manifest,
+                        post_from_list,
+                        location_getter.fork(),
+                    ),
+                )
+            )
+            tasks[task] = post_from_list
+        await collect(asyncio.ALL_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_usernames(
+    targets: Targets, account_subscriptions: Optional[list[SubscriptionModel]]
+) -> list[str]:
+    usernames = [*targets.usernames]
+    if account_subscriptions is not None:
+        usernames += [
+            subscription.user.username
+            for subscription in account_subscriptions
+            if subscription.status == ACTIVE_SUBSCRIPTION_STATUS
+        ]
+    return list(dict.fromkeys(usernames))
+
+
+def select_plans(
+    targets: Targets, user_plans: list[PlanModel]
+) -> Optional[list[PlanModel]]:
+    if targets.use_all_plans:
+        return user_plans
+    if len(targets.plan_ids) > 0:
+        return [plan for plan in user_plans if plan.id in targets.plan_ids]
+    return None
+
+
+def warn_missing_plans(targets: Targets, found_plan_ids: set[str]) -> None:
+    for plan_id in targets.plan_ids:
+        if plan_id not in found_plan_ids:
+            tqdm.write(f"{plan_id}: not a plan of the given creators")
+
+
+class Listing[T](NamedTuple):
+    key: str
+    name: str
+    posts_count: int
+    iter_posts: Callable[..., T]
+    location_getter: LocationGetter
+
+
+def get_user_listings[T](
+    targets: Targets,
+    username: str,
+    user: UserModel,
+    user_plans: list[PlanModel],
+    iter_user_posts: Callable[..., T],
+    iter_plan_posts: Callable[..., T],
+    location_getter: LocationGetter,
+    found_plan_ids: set[str],
+) -> list[Listing[T]]:
+    if (plans := select_plans(targets, user_plans)) is None:
+        return [
+            Listing(
+                f"user:{user.id}",
+                username,
+                user.posts_count,
+                partial(iter_user_posts, user.id),
+                location_getter,
+            )
+        ]
+    found_plan_ids.update(plan.id for plan in plans)
+    return [
+        Listing(
+            f"plan:{plan.id}",
+            f"{username} ({plan.product_name})",
+            plan.posts_count,
+            partial(iter_plan_posts, plan.id),
+            location_getter,
+        )
+        for plan in plans
+    ]
+
+
+def get_listings(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    targets: Targets,
+    location_getter: LocationGetter,
+) -> list[Listing[Iterator[PostFromListModel]]]:
+    account_subscriptions: Optional[list[SubscriptionModel]] = None
+    if requester.config.download.need_scrape_account:
+        _, account_subscriptions = download_account(
+            requester, image_downloader, location_getter
+        )
+    if targets.use_subscriptions and account_subscriptions is None:
+        account_subscriptions = requester.get_account_subscriptions()
+    usernames = get_usernames(
+        targets, account_subscriptions if targets.use_subscriptions else None
+    )
+
+    listings: list[Listing[Iterator[PostFromListModel]]] = []
+    found_plan_ids: set[str] = set()
+    for username in usernames:
+        user_location_getter = location_getter.fork()
+        try:
+            user, user_plans = download_user(
+                requester, image_downloader, username, "username", user_location_getter
+            )
+        except requests.RequestException as e:
+            tqdm.write(f"{username}: {e}")
+            continue
+        listings += get_user_listings(
+            targets,
+            username,
+            user,
+            user_plans,
+            requester.iter_user_posts,
+            requester.iter_plan_posts,
+            user_location_getter,
+            found_plan_ids,
+        )
+    warn_missing_plans(targets, found_plan_ids)
+    return listings
+
+
+def download_all(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    targets: Targets,
+    location_getter: LocationGetter,
+    post_filter: Optional[PostFilter],
+) -> None:
+    listings = get_listings(requester, image_downloader, targets, location_getter)
+    progress_bar = tqdm(
+        total=sum(listing.posts_count for listing in listings),
+        desc="Downloading posts",
+        unit="posts",
+    )
+    download_posts(
+        requester,
+        image_downloader,
+        hls_downloader,
+        video_scheduler,
+        manifest,
+        order_posts(
+            requester.config,
+            [
+                zip(listing.iter_posts(), repeat(listing.location_getter))
+                for listing in listings
+            ],
+        ),
+        post_filter,
+        progress_bar,
+    )
+    progress_bar.close()
+
+
+def iter_posts_until_cursor(
+    posts: Iterable[PostFromListModel],
+    cursor: Optional[PostCursor],
+    on_unpinned_post: Callable[[PostFromListModel], None],
+) -> Iterator[PostFromListModel]:
+    for post_from_list in posts:
+        if post_from_list.pinned_at is None:
+            if cursor is not None and (
+                post_from_list.id == cursor.post_id
+                or post_from_list.published_at < cursor.published_at
+            ):
+                return
+            on_unpinned_post(post_from_list)
+        yield post_from_list
+
+
+def get_cursor_post(
+    manifest: Manifest,
+    posts: list[PostFromListModel],
+    post_filter: Optional[PostFilter],
+    failed_post_counts: Counter[str],
+    max_post_attempts: int,
+) -> Optional[PostFromListModel]:
+    cursor_post: Optional[PostFromListModel] = None
+    is_blocked = False
+    for post_from_list in reversed(posts):
+        if (
+            post_filter is not None and not post_filter(post_from_list)
+        ) or manifest.is_post_completed(post_from_list.id, post_from_list.published_at):
+            failed_post_counts.pop(post_from_list.id, None)
+        else:
+            failed_post_counts[post_from_list.id] += 1
+            if failed_post_counts[post_from_list.id] < max_post_attempts:
+                is_blocked = True
+            elif not is_blocked:
+                tqdm.write(
+                    f"{post_from_list.id}: giving up after {max_post_attempts} attempts"
+                )
+                failed_post_counts.pop(post_from_list.id)
+        if not is_blocked:
+            cursor_post = post_from_list
+    return cursor_post
+
+
+def poll_listing(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    listing: Listing[Iterator[PostFromListModel]],
+    post_filter: Optional[PostFilter],
+    failed_post_counts: Counter[str],
+) -> None:
+    cursor = manifest.get_cursor(listing.key)
+    unpinned_posts: list[PostFromListModel] = []
+    posts = listing.iter_posts(requester.config.watch.per_page, prefetch=cursor is None)
+    progress_bar = tqdm(desc=f"Polling {listing.name}", unit="posts", leave=False)
+    download_posts(
+        requester,
+        image_downloader,
+        hls_downloader,
+        video_scheduler,
+        manifest,
+        zip(
+            iter_posts_until_cursor(posts, cursor, unpinned_posts.append),
+            repeat(listing.location_getter),
+        ),
+        post_filter,
+        progress_bar,
+    )
+    progress_bar.close()
+    video_scheduler.join()
+    requester.metrics.add("watch_polls_total", 1)
+    if len(unpinned_posts) > 0:
+        tqdm.write(f"{listing.name}: {progress_bar.n} new posts")
+    cursor_post = get_cursor_post(
+        manifest,
+        unpinned_posts,
+        post_filter,
+        failed_post_counts,
+        requester.config.watch.max_post_attempts,
+    )
+    if cursor_post is not None:
+        manifest.set_cursor(listing.key, cursor_post.id, cursor_post.published_at)
+
+
+def get_jittered_interval(interval: float, jitter: float) -> float:
+    return interval * random.uniform(1 - jitter, 1 + jitter)
+
+
+def watch_all(
+    requester: Requester,
+    image_downloader: ImageDownloader,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    targets: Targets,
+    location_getter: LocationGetter,
+    post_filter: Optional[PostFilter],
+) -> None:
+    watch_config = requester.config.watch
+    listings = get_listings(requester, image_downloader, targets, location_getter)
+    if len(listings) == 0:
+        return
+    started_at = time.monotonic()
+    schedule = [
+        (
+            started_at
+            + watch_config.interval * watch_config.jitter * i / len(listings),
+            i,
+        )
+        for i in range(len(listings))
+    ]
+    heapq.heapify(schedule)
+    failed_post_counts: Counter[str] = Counter()
+    while True:
+        poll_at, i = heapq.heappop(schedule)
+        time.sleep(max(0, poll_at - time.monotonic()))
+        listing = listings[i]
+        try:
+            poll_listing(
+                requester,
+                image_downloader,
+                hls_downloader,
+                video_scheduler,
+                manifest,
+                listing,
+                post_filter,
+                failed_post_counts,
+            )
+        except requests.RequestException as e:
+            tqdm.write(f"{listing.name}: {e}")
+        heapq.heappush(
+            schedule,
+            (
+                time.monotonic()
+                + get_jittered_interval(watch_config.interval, watch_config.jitter),
+                i,
+            ),
+        )
+
+
+async def async_with_location_getter(
+    posts: AsyncIterator[PostFromListModel], location_getter: LocationGetter
+) -> AsyncIterator[tuple[PostFromListModel, LocationGetter]]:
+    async for post_from_list in posts:
+        yield post_from_list, location_getter
+
+
+async def async_download_all(
+    requester: AsyncRequester,
+    image_downloader: AsyncImageDownloader,
+    video_requester: Requester,
+    hls_downloader: HlsDownloader,
+    video_scheduler: JobScheduler,
+    manifest: Manifest,
+    targets: Targets,
+    location_getter: LocationGetter,
+    post_filter: Optional[PostFilter],
+) -> None:
+    async with requester:
+        account_subscriptions: Optional[list[SubscriptionModel]] = None
+        if requester.config.download.need_scrape_account:
+            _, account_subscriptions = await async_download_account(
+                requester, image_downloader, location_getter
+            )
+        if targets.use_subscriptions and account_subscriptions is None:
+            account_subscriptions = await requester.get_account_subscriptions()
+        usernames = get_usernames(
+            targets, account_subscriptions if targets.use_subscriptions else None
+        )
+
+        user_location_getters = [location_getter.fork() for _ in usernames]
+        results = await asyncio.gather(
+            *(
+                async_download_user(
+                    requester, image_downloader, username, "username", getter
+                )
+                for username, getter in zip(usernames, user_location_getters)
+            ),
+            return_exceptions=True,
+        )
+        listings: list[Listing[AsyncIterator[PostFromListModel]]] = []
+        found_plan_ids: set[str] = set()
+        for username, getter, result in zip(usernames, user_location_getters, results):
+            if isinstance(result, aiohttp.ClientError):
+                tqdm.write(f"{username}: {result}")
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            user, user_plans = result
+            listings += get_user_listings(
+                targets,
+                username,
+                user,
+                user_plans,
+                requester.iter_user_posts,
+                requester.iter_plan_posts,
+                getter,
+                found_plan_ids,
+            )
+        warn_missing_plans(targets, found_plan_ids)
+
+        posts_list = [
+            async_with_location_getter(listing.iter_posts(), listing.location_getter)
+            for listing in listings
+        ]
+        progress_bar = tqdm(
+            total=sum(listing.posts_count for listing in listings),
+            desc="Downloading posts",
+            unit="posts",
+        )
+        await async_download_posts(
+            requester,
+            image_downloader,
+            video_requester,
+            hls_downloader,
+            video_scheduler,
+            manifest,
+            async_order_posts(requester.config, posts_list),
+            post_filter,
+            progress_bar,
+        )
+        progress_bar.close()
+
+
+def parse_targets(args: list[str]) -> Targets:
+    parser = argparse.ArgumentParser(description="Download posts from myfans.jp")
+    parser.add_argument("usernames", nargs="*", help="usernames of creators")
+    parser.add_argument(
+        "-f",
+        "--file",
+        action="append",
+        default=[],
+        help="file with one username per line",
+    )
+    parser.add_argument(
+        "-s",
+        "--subscriptions",
+        action="store_true",
+        help="download every creator with an active subscription",
+    )
+    parser.add_argument(
+        "-p",
+        "--plan",
+        action="append",
+        default=[],
+        help="only download posts of this plan id of the given creators",
+    )
+    parser.add_argument(
+        "--all-plans",
+        action="store_true",
+        help="download posts through every plan of the given creators",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="keep polling the given creators for new posts",
+    )
+    parsed = parser.parse_args(args)
+    usernames: list[str] = [*parsed.usernames]
+    for file_path in parsed.file:
+        with open(file_path, "r") as f:
+            usernames += [
+                line
+                for raw_line in f
+                if (line := raw_line.strip()) != "" and not line.startswith("#")
+            ]
+    if len(usernames) == 0 and not parsed.subscriptions:
+        parser.error("no usernames given")
+    return Targets(
+        usernames=usernames,
+        use_subscriptions=parsed.subscriptions,
+        plan_ids=parsed.plan,
+        use_all_plans=parsed.all_plans,
+        use_watch=parsed.watch,
+    )
+
+
 def main():
+    targets = parse_targets(sys.argv[1:])
     config = get_config()
     if config.auth.token == "":
         print("Please fill in the token in config.toml")
         return
 
-    requester = Requester(config)
+    metrics = Metrics()
+    metrics_exporter = MetricsExporter(metrics, config.metrics)
+    manifest: Optional[Manifest] = None
+    try:
+        bandwidth_limiter = BandwidthLimiter(config.bandwidth, on_reload=tqdm.write)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: bandwidth_limiter.request_reload())
+        requester = Requester(config, metrics, bandwidth_limiter)
 
-    username = sys.argv[1]
+        location_getter = LocationGetter(config)
+        post_filter = (
+            compile_post_filter(config.download.post.filter)
+            if config.download.post.filter is not None
+            else None
+        )
 
-    location_getter = LocationGetter(config)
+        downloads_dir_path = location_getter.get_downloads_root_dir_path()
+        if not path.exists(downloads_dir_path):
+            os.makedirs(downloads_dir_path)
+        manifest = Manifest(
+            path.join(downloads_dir_path, n)
+            if (n := config.download.manifest_filename) is not None
+            else None
+        )
+        blob_store = (
+            BlobStore(path.join(downloads_dir_path, n), config.download.blob_link_mode)
+            if (n := config.download.blob_dir_name) is not None
+            else None
+        )
+        hls_downloader = HlsDownloader(requester)
 
-    if config.download.need_scrape_account:
-        download_account(requester, location_getter)
-    user, _ = download_user(requester, username, "username", location_getter)
-    posts = requester.get_user_posts(user.id, 200, 1).data
-    progress_bar = tqdm(total=len(posts), desc="Downloading posts", unit="posts")
-    for post_from_list in posts:
-        download_post(requester, post_from_list, location_getter)
-        progress_bar.update(1)
-    progress_bar.close()
+        def report_video_job(report: JobReport) -> None:
+            metrics.observe("queue_wait_seconds", report.wait_time, phase="video")
+            metrics.observe("phase_duration_seconds", report.duration, phase="video")
+            tqdm.write(
+                f"{report.name}: {report.duration:.1f}s, "
+                f"{(report.size or 0) / 1024 / 1024:.1f} MiB"
+            )
+
+        def report_failed_video_job(name: str, e: BaseException) -> None:
+            metrics.add("videos_failed_total", 1)
+            tqdm.write(f"{name}: {e}")
+
+        video_scheduler = JobScheduler(
+            config.download.max_concurrent_videos,
+            on_report=report_video_job,
+            on_error=report_failed_video_job,
+        )
+
+        api_requester: Requester | AsyncRequester
+        if config.request.use_async and not targets.use_watch:
+            api_requester = AsyncRequester(config, metrics, bandwidth_limiter)
+            async_image_downloader = AsyncImageDownloader(
+                api_requester, manifest, blob_store
+            )
+            image_meter = async_image_downloader.meter
+            asyncio.run(
+                async_download_all(
+                    api_requester,
+                    async_image_downloader,
+                    requester,
+                    hls_downloader,
+                    video_scheduler,
+                    manifest,
+                    targets,
+                    location_getter,
+                    post_filter,
+                )
+            )
+        else:
+            api_requester = requester
+            image_downloader = ImageDownloader(requester, manifest, blob_store)
+            image_meter = image_downloader.meter
+            if targets.use_watch:
+                try:
+                    watch_all(
+                        requester,
+                        image_downloader,
+                        hls_downloader,
+                        video_scheduler,
+                        manifest,
+                        targets,
+                        location_getter,
+                        post_filter,
+                    )
+                except KeyboardInterrupt:
+                    tqdm.write("Stopped watching")
+            else:
+                download_all(
+                    requester,
+                    image_downloader,
+                    hls_downloader,
+                    video_scheduler,
+                    manifest,
+                    targets,
+                    location_getter,
+                    post_filter,
+                )
+        video_scheduler.join()
+        video_scheduler.shutdown()
+        print(image_meter.get_summary("Images"))
+        if blob_store is not None:
+            print(blob_store.get_summary())
+        print(video_scheduler.get_summary("Videos"))
+        print(api_requester.rate_limiter.get_summary())
+        if bandwidth_limiter.throttled_time > 0:
+            print(
+                f"Bandwidth: {bandwidth_limiter.get_summary()}, "
+                f"{bandwidth_limiter.throttled_time:.1f}s throttled"
+            )
+        if (retry_summary := api_requester.policy.get_summary()) is not None:
+            print(retry_summary)
+        if api_requester is not requester and requester.cache is not None:
+            requester.cache.close()
+        if api_requester.cache is not None:
+            api_requester.cache.close()
+            print(api_requester.cache.get_summary())
+
+    finally:
+        if manifest is not None:
+            manifest.close()
+        metrics_exporter.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import sqlite3
+from datetime import datetime
+from os import path
+from threading import Lock
+from typing import NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    published_at TEXT NOT NULL,
+    dir_path TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS media (
+    file_path TEXT PRIMARY KEY,
+    post_id TEXT,
+    url TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS media_post_id ON media (post_id);
+CREATE TABLE IF NOT EXISTS cursors (
+    key TEXT PRIMARY KEY,
+    post_id TEXT NOT NULL,
+    published_at TEXT NOT NULL
+);
+"""
+
+
+class PostCursor(NamedTuple):
+    post_id: str
+    published_at: datetime
+
+
+class Manifest:
+    def __init__(self, file_path: Optional[str]) -> None:
+        if file_path is None:
+            file_path = ":memory:"
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(
+            file_path, check_same_thread=False, isolation_level=None
+        )
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+    def is_post_completed(self, id: str, published_at: datetime) -> bool:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT published_at, dir_path FROM posts WHERE id = ? AND completed",
+                (id,),
+            ).fetchone()
+        if row is None:
+            return False
+        recorded_published_at, dir_path = row
+        return recorded_published_at == published_at.isoformat() and path.isdir(
+            dir_path
+        )
+
+    def start_post(self, id: str, published_at: datetime, dir_path: str) -> None:
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT INTO posts (id, published_at, dir_path, completed)"
+                " VALUES (?, ?, ?, 0) ON CONFLICT (id) DO UPDATE SET"
+                " published_at = excluded.published_at,"
+                " dir_path = excluded.dir_path, completed = 0",
+                (id, published_at.isoformat(), dir_path),
+            )
+
+    def complete_post(self, id: str) -> None:
+        with self.__lock:
+            self.__connection.execute(
+                "UPDATE posts SET completed = 1 WHERE id = ?", (id,)
+            )
+
+    def has_media(self, file_path: str, url: str) -> bool:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT size FROM media WHERE file_path = ? AND url = ?",
+                (file_path, url),
+            ).fetchone()
+        if row is None:
+            return False
+        return path.isfile(file_path) and path.getsize(file_path) == row[0]
+
+    def add_media(
+        self,
+        file_path: str,
+        url: str,
+        size: int,
+        sha256: Optional[str],
+        post_id: Optional[str] = None,
+    ) -> None:
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO media (file_path, post_id, url, size, sha256)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (file_path, post_id, url, size, sha256),
+            )
+
+    def get_cursor(self, key: str) -> Optional[PostCursor]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT post_id, published_at FROM cursors WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        post_id, published_at = row
+        return PostCursor(post_id, datetime.fromisoformat(published_at))
+
+    def set_cursor(self, key: str, post_id: str, published_at: datetime) -> None:
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO cursors (key, post_id, published_at)"
+                " VALUES (?, ?, ?)",
+                (key, post_id, published_at.isoformat()),
+            )
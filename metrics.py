@@ -0,0 +1,246 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from os import path
+from threading import Event, Lock, Thread
+from typing import Any, Optional, cast
+
+from config import MetricsConfig
+
+
+class ThroughputMeter:
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__started_at = time.monotonic()
+        self.count = 0
+        self.bytes = 0
+
+    def add(self, nbytes: int) -> None:
+        with self.__lock:
+            self.count += 1
+            self.bytes += nbytes
+
+    def get_summary(self, name: str) -> str:
+        elapsed = max(time.monotonic() - self.__started_at, 1e-9)
+        mib = self.bytes / 1024 / 1024
+        return (
+            f"{name}: {self.count} files, {mib:.1f} MiB in {elapsed:.1f}s "
+            f"({self.count / elapsed:.1f} files/s, {mib / elapsed:.2f} MiB/s)"
+        )
+
+
+HISTOGRAM_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    float("inf"),
+)
+METRIC_NAME_PREFIX = "myfans_"
+
+MetricKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.bucket_counts = [0] * len(HISTOGRAM_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(HISTOGRAM_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def get_metric_key(name: str, labels: dict[str, str]) -> MetricKey:
+    return name, tuple(sorted(labels.items()))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    label_strs = [f'{k}="{escape_label_value(v)}"' for k, v in labels]
+    return "{" + ",".join(label_strs) + "}" if len(label_strs) > 0 else ""
+
+
+def format_bucket_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__histograms: dict[MetricKey, Histogram] = {}
+        self.__counters: dict[MetricKey, float] = {}
+        self.__gauges: dict[MetricKey, float] = {}
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = get_metric_key(name, labels)
+        with self.__lock:
+            if (histogram := self.__histograms.get(key)) is None:
+                histogram = self.__histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def add(self, name: str, value: float, **labels: str) -> None:
+        key = get_metric_key(name, labels)
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        key = get_metric_key(name, labels)
+        with self.__lock:
+            self.__gauges[key] = value
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started_at, **labels)
+
+    def run_queued[T](
+        self,
+        phase: str,
+        submitted_at: float,
+        function: Callable[..., T],
+        *args: Any,
+    ) -> T:
+        self.observe("queue_wait_seconds", time.monotonic() - submitted_at, phase=phase)
+        with self.time("phase_duration_seconds", phase=phase):
+            return function(*args)
+
+    async def run_timed_async[T](self, phase: str, awaitable: Awaitable[T]) -> T:
+        with self.time("phase_duration_seconds", phase=phase):
+            return await awaitable
+
+    async def run_queued_async[T](
+        self, phase: str, submitted_at: float, awaitable: Awaitable[T]
+    ) -> T:
+        self.observe("queue_wait_seconds", time.monotonic() - submitted_at, phase=phase)
+        return await self.run_timed_async(phase, awaitable)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self.__lock:
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count,
+                    "buckets": {
+                        format_bucket_bound(bound): count
+                        for bound, count in zip(
+                            HISTOGRAM_BUCKETS, histogram.bucket_counts
+                        )
+                    },
+                }
+                for (name, labels), histogram in sorted(self.__histograms.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.__counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.__gauges.items())
+            ]
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "histograms": histograms,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        with self.__lock:
+            typed_names: set[str] = set()
+            for (name, labels), histogram in sorted(self.__histograms.items()):
+                metric_name = METRIC_NAME_PREFIX + name
+                if metric_name not in typed_names:
+                    typed_names.add(metric_name)
+                    lines.append(f"# TYPE {metric_name} histogram")
+                cumulative_count = 0
+                for bound, count in zip(HISTOGRAM_BUCKETS, histogram.bucket_counts):
+                    cumulative_count += count
+                    bucket_labels = (*labels, ("le", format_bucket_bound(bound)))
+                    lines.append(
+                        f"{metric_name}_bucket{format_labels(bucket_labels)}"
+                        f" {cumulative_count}"
+                    )
+                lines.append(
+                    f"{metric_name}_sum{format_labels(labels)} {histogram.sum}"
+                )
+                lines.append(
+                    f"{metric_name}_count{format_labels(labels)} {histogram.count}"
+                )
+            for (name, labels), value in sorted(self.__counters.items()):
+                metric_name = METRIC_NAME_PREFIX + name
+                if metric_name not in typed_names:
+                    typed_names.add(metric_name)
+                    lines.append(f"# TYPE {metric_name} counter")
+                lines.append(f"{metric_name}{format_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.__gauges.items()):
+                metric_name = METRIC_NAME_PREFIX + name
+                if metric_name not in typed_names:
+                    typed_names.add(metric_name)
+                    lines.append(f"# TYPE {metric_name} gauge")
+                lines.append(f"{metric_name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def write_atomically(file_path: str, content: str) -> None:
+    if (dir_path := path.dirname(file_path)) != "":
+        os.makedirs(dir_path, exist_ok=True)
+    temp_file_path = f"{file_path}.tmp"
+    with open(temp_file_path, "w") as f:
+        f.write(content)
+    os.replace(temp_file_path, file_path)
+
+
+class MetricsExporter:
+    def __init__(self, metrics: Metrics, config: MetricsConfig) -> None:
+        self.metrics = metrics
+        self.config = config
+        self.__stopped = Event()
+        self.__thread: Optional[Thread] = None
+        if config.export_interval is not None and config.export_interval > 0:
+            self.__thread = Thread(target=self.__export_periodically, daemon=True)
+            self.__thread.start()
+
+    def __export_periodically(self) -> None:
+        interval = cast(float, self.config.export_interval)
+        while not self.__stopped.wait(interval):
+            self.export()
+
+    def export(self) -> None:
+        if (file_path := self.config.json_file_path) is not None:
+            write_atomically(file_path, json.dumps(self.metrics.to_dict(), indent=2))
+        if (file_path := self.config.prometheus_file_path) is not None:
+            write_atomically(file_path, self.metrics.to_prometheus())
+
+    def close(self) -> None:
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.export()
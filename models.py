@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel as BaseBasicModel
-from pydantic import ConfigDict
+from pydantic import ConfigDict, TypeAdapter
 
 
 class BaseModel(BaseBasicModel):
@@ -246,3 +246,10 @@ class PostModel(PostBasicModel):
     commentable: bool
     main_video_info: Optional[PostMainVideoInfoModel]
     single_plan: Optional[PostSinglePlanModel]
+
+
+PagedPostsFromListModel = PagedDataModel[PostFromListModel]
+
+subscriptions_adapter = TypeAdapter(list[SubscriptionModel])
+plans_adapter = TypeAdapter(list[PlanModel])
+post_tags_adapter = TypeAdapter(list[PostTagModel])
@@ -0,0 +1,190 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from threading import Condition, Lock
+from typing import Optional
+
+import requests
+
+from config import RequestConfig
+from rate_limiter import parse_retry_after
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN_TOKENS = 10.0
+CIRCUIT_BREAKER_MAX_COOLDOWN = 600.0
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code in (
+            RETRYABLE_STATUS_CODES
+        )
+    return isinstance(
+        e,
+        (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    )
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    if not isinstance(e, requests.RequestException) or e.response is None:
+        return None
+    return parse_retry_after(e.response.headers.get("Retry-After"))
+
+
+class RetryBudget:
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__tokens = RETRY_BUDGET_MIN_TOKENS
+
+    def deposit(self) -> None:
+        with self.__lock:
+            self.__tokens = min(
+                RETRY_BUDGET_MIN_TOKENS * 10, self.__tokens + RETRY_BUDGET_RATIO
+            )
+
+    def withdraw(self) -> bool:
+        with self.__lock:
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        self.__failure_threshold = max(1, failure_threshold)
+        self.__base_cooldown = cooldown
+        self.__cooldown = cooldown
+        self.__condition = Condition()
+        self.__failure_count = 0
+        self.__open_until = 0.0
+
+    def get_open_time(self) -> float:
+        return max(0.0, self.__open_until - time.monotonic())
+
+    def wait(self) -> None:
+        with self.__condition:
+            while (remaining := self.get_open_time()) > 0:
+                self.__condition.wait(remaining)
+
+    def on_success(self) -> None:
+        with self.__condition:
+            self.__failure_count = 0
+            self.__cooldown = self.__base_cooldown
+
+    def on_failure(self) -> None:
+        with self.__condition:
+            self.__failure_count += 1
+            if self.__failure_count < self.__failure_threshold:
+                return
+            self.__failure_count = 0
+            self.__open_until = time.monotonic() + self.__cooldown
+            self.__cooldown = min(CIRCUIT_BREAKER_MAX_COOLDOWN, self.__cooldown * 2)
+
+
+class RequestPolicy:
+    def __init__(self, config: RequestConfig) -> None:
+        self.timeout = (config.connect_timeout, config.timeout)
+        self.retry_counts: dict[str, int] = {}
+        self.__max_retry_times = config.max_retry_times
+        self.__retry_interval_range = config.retry_interval_range
+        self.__circuit_breaker = CircuitBreaker(
+            config.circuit_breaker_failure_threshold, config.circuit_breaker_cooldown
+        )
+        self.__lock = Lock()
+        self.__retry_budgets: dict[str, RetryBudget] = {}
+
+    def __get_retry_budget(self, endpoint: str) -> RetryBudget:
+        with self.__lock:
+            if endpoint not in self.__retry_budgets:
+                self.__retry_budgets[endpoint] = RetryBudget()
+                self.retry_counts[endpoint] = 0
+            return self.__retry_budgets[endpoint]
+
+    def __get_retry_interval(self, attempt: int, retry_after: Optional[float]) -> float:
+        min_interval, max_interval = self.__retry_interval_range
+        interval = random.uniform(
+            min_interval, min(max_interval, min_interval * 2**attempt)
+        )
+        if retry_after is not None:
+            interval = max(interval, retry_after)
+        return interval
+
+    def __on_success(self, endpoint: str) -> None:
+        self.__circuit_breaker.on_success()
+        self.__get_retry_budget(endpoint).deposit()
+
+    def __on_error(
+        self,
+        endpoint: str,
+        attempt: int,
+        is_retryable: bool,
+        retry_after: Optional[float],
+    ) -> Optional[float]:
+        if not is_retryable:
+            self.__circuit_breaker.on_success()
+            return None
+        self.__circuit_breaker.on_failure()
+        if (
+            attempt >= self.__max_retry_times
+            or not self.__get_retry_budget(endpoint).withdraw()
+        ):
+            return None
+        with self.__lock:
+            self.retry_counts[endpoint] += 1
+        return self.__get_retry_interval(attempt, retry_after)
+
+    def run[T](self, endpoint: str, function: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            self.__circuit_breaker.wait()
+            try:
+                result = function()
+            except requests.RequestException as e:
+                interval = self.__on_error(
+                    endpoint, attempt, is_retryable(e), get_retry_after(e)
+                )
+                if interval is None:
+                    raise
+                time.sleep(interval)
+                attempt += 1
+            else:
+                self.__on_success(endpoint)
+                return result
+
+    async def run_async[T](
+        self,
+        endpoint: str,
+        function: Callable[[], Awaitable[T]],
+        is_retryable: Callable[[Exception], bool],
+        get_retry_after: Callable[[Exception], Optional[float]],
+    ) -> T:
+        attempt = 0
+        while True:
+            while (open_time := self.__circuit_breaker.get_open_time()) > 0:
+                await asyncio.sleep(open_time)
+            try:
+                result = await function()
+            except Exception as e:
+                interval = self.__on_error(
+                    endpoint, attempt, is_retryable(e), get_retry_after(e)
+                )
+                if interval is None:
+                    raise
+                await asyncio.sleep(interval)
+                attempt += 1
+            else:
+                self.__on_success(endpoint)
+                return result
+
+    def get_summary(self) -> Optional[str]:
+        retry_counts = {k: v for k, v in self.retry_counts.items() if v > 0}
+        if len(retry_counts) == 0:
+            return None
+        return "Retries: " + ", ".join(f"{k}={v}" for k, v in retry_counts.items())
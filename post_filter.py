@@ -0,0 +1,290 @@
+import ast
+import operator
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Union, get_args, get_origin, get_type_hints
+
+from pydantic import BaseModel
+
+from models import PostFromListModel
+
+DEFAULT_TIMEZONE = timezone(timedelta(hours=9))
+
+PostFilter = Callable[[PostFromListModel], bool]
+Getter = Callable[[PostFromListModel], Any]
+
+compare_operator_dict: dict[type[ast.cmpop], Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+ordering_operator_types = (ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+membership_operator_types = (ast.In, ast.NotIn)
+
+
+def parse_datetime(value: str) -> datetime:
+    value_datetime = datetime.fromisoformat(value)
+    if value_datetime.tzinfo is None:
+        value_datetime = value_datetime.replace(tzinfo=DEFAULT_TIMEZONE)
+    return value_datetime
+
+
+def days_ago(days: float) -> datetime:
+    return datetime.now(DEFAULT_TIMEZONE) - timedelta(days=days)
+
+
+supported_function_dict: dict[str, Callable[..., Any]] = {
+    "datetime": parse_datetime,
+    "days_ago": days_ago,
+}
+
+
+def unwrap_optional(type_: Any) -> Any:
+    if get_origin(type_) is Union:
+        type_args = [t for t in get_args(type_) if t is not type(None)]
+        if len(type_args) == 1:
+            return type_args[0]
+    return type_
+
+
+def get_key_path_type(key_path: list[str]) -> Any:
+    type_: Any = PostFromListModel
+    for key in key_path:
+        type_ = unwrap_optional(type_)
+        is_list = get_origin(type_) is list
+        if is_list:
+            type_ = unwrap_optional(get_args(type_)[0])
+        if not (isinstance(type_, type) and issubclass(type_, BaseModel)):
+            raise ValueError(f"Invalid path: '{'.'.join(key_path)}' at '{key}'")
+        if key not in type_.model_fields:
+            raise ValueError(f"Invalid path: '{'.'.join(key_path)}' at '{key}'")
+        type_ = type_.model_fields[key].annotation
+        if is_list:
+            type_ = list[type_]  # type: ignore[valid-type]
+    return unwrap_optional(type_)
+
+
+def get_key_path_value(value: Any, key_path: list[str]) -> Any:
+    for key in key_path:
+        if value is None:
+            return None
+        if isinstance(value, list):
+            value = [getattr(item, key) for item in value]
+        else:
+            value = getattr(value, key)
+    return value
+
+
+def get_key_path(node: ast.expr) -> Optional[list[str]]:
+    keys: list[str] = []
+    while isinstance(node, ast.Attribute):
+        keys.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    keys.append(node.id)
+    return keys[::-1]
+
+
+def get_function_types(function: Callable[..., Any]) -> tuple[list[Any], Any]:
+    type_hints = get_type_hints(function)
+    return_type = type_hints.pop("return", Any)
+    return list(type_hints.values()), return_type
+
+
+def is_compatible_type(value_type: Any, field_type: Any) -> bool:
+    if get_origin(value_type) is Union:
+        return all(is_compatible_type(t, field_type) for t in get_args(value_type))
+    if value_type is Any or field_type is Any or value_type is type(None):
+        return True
+    if get_origin(field_type) is list:
+        return get_origin(value_type) is list and is_compatible_type(
+            get_args(value_type)[0], get_args(field_type)[0]
+        )
+    if get_origin(value_type) is list:
+        return False
+    if field_type is datetime:
+        return value_type in (datetime, str)
+    if field_type in (int, float):
+        return value_type in (int, float)
+    return (
+        isinstance(field_type, type)
+        and isinstance(value_type, type)
+        and issubclass(value_type, field_type)
+    )
+
+
+def format_type(type_: Any) -> str:
+    return type_.__name__ if isinstance(type_, type) else str(type_)
+
+
+def compile_constant(node: ast.expr, other_type: Any) -> tuple[Callable[[], Any], Any]:
+    match node:
+        case ast.Constant(value=value):
+            if other_type is datetime and isinstance(value, str):
+                value = parse_datetime(value)
+            return lambda: value, type(value)
+        case ast.UnaryOp(
+            op=ast.USub(), operand=ast.Constant(value=value)
+        ) if isinstance(value, int | float) and not isinstance(value, bool):
+            negated_value = -value
+            return lambda: negated_value, type(negated_value)
+        case ast.List(elts=elts) | ast.Tuple(elts=elts) | ast.Set(elts=elts):
+            compiled_elts = [compile_constant(elt, other_type) for elt in elts]
+            elt_getters = [get_elt for get_elt, _ in compiled_elts]
+            elt_types = tuple({elt_type for _, elt_type in compiled_elts})
+            return (
+                lambda: [get_elt() for get_elt in elt_getters],
+                (
+                    list[Union[elt_types]]  # type: ignore[valid-type]
+                    if len(elt_types) > 0
+                    else list[Any]
+                ),
+            )
+        case ast.Call(func=ast.Name(id=name), args=args, keywords=[]):
+            if name not in supported_function_dict:
+                raise ValueError(f"Unsupported function: {name}")
+            function = supported_function_dict[name]
+            parameter_types, return_type = get_function_types(function)
+            if len(args) != len(parameter_types):
+                raise ValueError(
+                    f"{name}() takes {len(parameter_types)} arguments: "
+                    f"{ast.unparse(node)}"
+                )
+            arg_getters: list[Callable[[], Any]] = []
+            for arg, parameter_type in zip(args, parameter_types):
+                get_arg, arg_type = compile_constant(arg, None)
+                if not is_compatible_type(arg_type, parameter_type):
+                    raise ValueError(
+                        f"{name}() takes {format_type(parameter_type)}: "
+                        f"{ast.unparse(node)}"
+                    )
+                arg_getters.append(get_arg)
+            return (
+                lambda: function(*(get_arg() for get_arg in arg_getters)),
+                return_type,
+            )
+    raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def compile_operand(node: ast.expr, other_type: Any) -> tuple[Getter, Any]:
+    if (key_path := get_key_path(node)) is not None:
+        return (
+            lambda post: get_key_path_value(post, key_path),
+            get_key_path_type(key_path),
+        )
+    get_value, value_type = compile_constant(node, other_type)
+    if any(isinstance(n, ast.Call) for n in ast.walk(node)):
+        return lambda _: get_value(), value_type
+    value = get_value()
+    return lambda _: value, value_type
+
+
+def check_operand_types(
+    left_node: ast.expr,
+    op: ast.cmpop,
+    right_node: ast.expr,
+    left_type: Any,
+    right_type: Any,
+) -> None:
+    left_key_path = get_key_path(left_node)
+    right_key_path = get_key_path(right_node)
+    if left_key_path is not None and right_key_path is None:
+        key_path, field_type, value_type = left_key_path, left_type, right_type
+        value_node = right_node
+    elif left_key_path is None and right_key_path is not None:
+        key_path, field_type, value_type = right_key_path, right_type, left_type
+        value_node = left_node
+    else:
+        return
+    if isinstance(op, membership_operator_types):
+        container_type = right_type
+        if get_origin(container_type) is list:
+            element_type = get_args(container_type)[0]
+            if left_key_path is not None:
+                is_compatible = is_compatible_type(element_type, field_type)
+            else:
+                is_compatible = is_compatible_type(value_type, element_type)
+        else:
+            is_compatible = container_type is str and left_type in (str, type(None))
+    else:
+        is_compatible = is_compatible_type(value_type, field_type)
+    if not is_compatible:
+        raise ValueError(
+            f"Cannot compare {'.'.join(key_path)} "
+            f"of type {format_type(field_type)} with {ast.unparse(value_node)}"
+        )
+
+
+def compile_compare(node: ast.Compare) -> Getter:
+    operand_nodes = [node.left, *node.comparators]
+    key_path_types = [
+        get_key_path_type(key_path)
+        for operand_node in operand_nodes
+        if (key_path := get_key_path(operand_node)) is not None
+    ]
+    other_type = key_path_types[0] if len(key_path_types) > 0 else None
+    compiled_operands = [
+        compile_operand(operand_node, other_type) for operand_node in operand_nodes
+    ]
+    for i, op in enumerate(node.ops):
+        check_operand_types(
+            operand_nodes[i],
+            op,
+            operand_nodes[i + 1],
+            compiled_operands[i][1],
+            compiled_operands[i + 1][1],
+        )
+    getters = [getter for getter, _ in compiled_operands]
+    comparisons: list[tuple[Getter, Callable[[Any, Any], bool], Getter, bool]] = [
+        (
+            getters[i],
+            compare_operator_dict[type(op)],
+            getters[i + 1],
+            isinstance(op, ordering_operator_types + membership_operator_types),
+        )
+        for i, op in enumerate(node.ops)
+    ]
+
+    def compare(post: PostFromListModel) -> bool:
+        for get_left, compare_values, get_right, is_none_false in comparisons:
+            left, right = get_left(post), get_right(post)
+            if is_none_false and (left is None or right is None):
+                return False
+            if not compare_values(left, right):
+                return False
+        return True
+
+    return compare
+
+
+def compile_node(node: ast.expr) -> Getter:
+    match node:
+        case ast.BoolOp(op=ast.And(), values=values):
+            getters = [compile_node(value) for value in values]
+            return lambda post: all(getter(post) for getter in getters)
+        case ast.BoolOp(op=ast.Or(), values=values):
+            getters = [compile_node(value) for value in values]
+            return lambda post: any(getter(post) for getter in getters)
+        case ast.UnaryOp(op=ast.Not(), operand=operand):
+            getter = compile_node(operand)
+            return lambda post: not getter(post)
+        case ast.Compare():
+            return compile_compare(node)
+    return compile_operand(node, None)[0]
+
+
+def compile_post_filter(expression: str) -> PostFilter:
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid post filter: '{expression}': {e.msg}")
+    getter = compile_node(tree.body)
+    return lambda post: bool(getter(post))
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import Condition
+from typing import Optional
+
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0
+ASYNC_POLL_INTERVAL = 0.01
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        max_concurrency: int,
+        on_change: Optional[Callable[[float, int], None]] = None,
+    ) -> None:
+        self.__on_change = on_change
+        self.__min_rate = min_rate
+        self.__max_rate = max_rate
+        self.__max_concurrency = max(1, max_concurrency)
+        self.__condition = Condition()
+        self.__rate = min(max(rate, min_rate), max_rate)
+        self.__concurrency = float(self.__max_concurrency)
+        self.__tokens = 1.0
+        self.__refilled_at = time.monotonic()
+        self.__paused_until = 0.0
+        self.__decreased_at = 0.0
+        self.__in_flight_count = 0
+        if on_change is not None:
+            on_change(self.rate, self.concurrency)
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    @property
+    def concurrency(self) -> int:
+        return int(self.__concurrency)
+
+    def __refill(self, now: float) -> None:
+        burst = max(1.0, self.__rate)
+        self.__tokens = min(
+            burst, self.__tokens + (now - self.__refilled_at) * self.__rate
+        )
+        self.__refilled_at = now
+
+    def __try_acquire(self) -> Optional[float]:
+        now = time.monotonic()
+        self.__refill(now)
+        if now < self.__paused_until:
+            return self.__paused_until - now
+        if self.__in_flight_count >= int(self.__concurrency):
+            return None
+        if self.__tokens < 1:
+            return (1 - self.__tokens) / self.__rate
+        self.__tokens -= 1
+        self.__in_flight_count += 1
+        return 0
+
+    def acquire(self) -> None:
+        with self.__condition:
+            while (wait_time := self.__try_acquire()) != 0:
+                self.__condition.wait(wait_time)
+
+    async def acquire_async(self) -> None:
+        while True:
+            with self.__condition:
+                wait_time = self.__try_acquire()
+            if wait_time == 0:
+                return
+            await asyncio.sleep(wait_time or ASYNC_POLL_INTERVAL)
+
+    def release(self, is_throttled: bool, retry_after: Optional[float] = None) -> None:
+        with self.__condition:
+            self.__in_flight_count -= 1
+            now = time.monotonic()
+            if is_throttled:
+                if retry_after is not None:
+                    self.__paused_until = max(self.__paused_until, now + retry_after)
+                if now - self.__decreased_at >= DECREASE_COOLDOWN:
+                    self.__decreased_at = now
+                    self.__rate = max(self.__min_rate, self.__rate * DECREASE_FACTOR)
+                    self.__concurrency = max(1.0, self.__concurrency * DECREASE_FACTOR)
+                    self.__tokens = min(self.__tokens, 1.0)
+            else:
+                self.__rate = min(self.__max_rate, self.__rate + 1 / self.__rate)
+                self.__concurrency = min(
+                    float(self.__max_concurrency),
+                    self.__concurrency + 1 / self.__concurrency,
+                )
+            if self.__on_change is not None:
+                self.__on_change(self.rate, self.concurrency)
+            self.__condition.notify_all()
+
+    def get_summary(self) -> str:
+        return f"API rate limit: {self.rate:.2f} req/s, {self.concurrency} concurrent"
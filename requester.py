@@ -1,82 +1,228 @@
-from typing import Literal
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Optional
 
 import requests
-from pydantic import TypeAdapter
+from requests.adapters import HTTPAdapter
 
 import models
 import urls
+from bandwidth import BandwidthLimiter
+from cache import ResponseCache
 from config import Config
 from headers import get_headers
+from metrics import Metrics
+from policy import RequestPolicy
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
 
 
 class Requester:
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        metrics: Optional[Metrics] = None,
+        bandwidth_limiter: Optional[BandwidthLimiter] = None,
+    ) -> None:
         self.config = config
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.bandwidth_limiter = (
+            bandwidth_limiter
+            if bandwidth_limiter is not None
+            else BandwidthLimiter(config.bandwidth)
+        )
         self.session = requests.Session()
         self.session.headers = get_headers(config)
+        adapter = HTTPAdapter(pool_maxsize=config.request.max_connections_per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         if config.request.proxy_url is not None and config.request.proxy_url != "":
             self.session.proxies.update({"https": config.request.proxy_url})
+        self.__executor = ThreadPoolExecutor(
+            max_workers=3 * max(1, config.download.max_concurrent_posts)
+        )
+        self.rate_limiter = AdaptiveRateLimiter(
+            config.request.requests_per_second,
+            config.request.min_requests_per_second,
+            config.request.max_requests_per_second,
+            config.request.max_concurrent_requests,
+            self.__set_rate_limit_gauges,
+        )
+        self.policy = RequestPolicy(config.request)
+        cache_config = config.request.cache
+        self.cache = (
+            ResponseCache(
+                cache_config.file_path,
+                config.auth.token,
+                cache_config.max_size_mb * 1024 * 1024,
+                cache_config.ttl_seconds,
+            )
+            if cache_config.enabled
+            else None
+        )
+
+    def __get(self, endpoint: str, url: str) -> bytes:
+        if self.cache is None:
+            return self.policy.run(
+                endpoint, lambda: self.__get_once(endpoint, url)
+            ).content
+        key = self.cache.get_key(url)
+        cached = self.cache.get(endpoint, key)
+        if cached is not None and cached.is_fresh:
+            return cached.body
+        headers = cached.get_conditional_headers() if cached is not None else {}
+        resp = self.policy.run(
+            endpoint, lambda: self.__get_once(endpoint, url, headers)
+        )
+        if resp.status_code == 304 and cached is not None:
+            self.cache.revalidate(key)
+            return cached.body
+        self.cache.put(
+            key,
+            resp.content,
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+        )
+        return resp.content
+
+    def __get_once(
+        self, endpoint: str, url: str, headers: Optional[dict[str, str]] = None
+    ) -> requests.Response:
+        self.rate_limiter.acquire()
+        is_throttled = True
+        retry_after: Optional[float] = None
+        status = "error"
+        started_at = time.monotonic()
+        try:
+            resp = self.session.get(url, headers=headers, timeout=self.policy.timeout)
+            status = str(resp.status_code)
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            is_throttled = (
+                resp.status_code == 429
+                or resp.status_code >= 500
+                or retry_after is not None
+            )
+        finally:
+            self.rate_limiter.release(is_throttled, retry_after)
+            self.metrics.observe(
+                "api_request_duration_seconds",
+                time.monotonic() - started_at,
+                endpoint=endpoint,
+            )
+            self.metrics.add("api_responses_total", 1, endpoint=endpoint, status=status)
+        self.metrics.add("transferred_bytes_total", len(resp.content), kind="api")
+        resp.raise_for_status()
+        return resp
+
+    def __set_rate_limit_gauges(self, rate: float, concurrency: int) -> None:
+        self.metrics.set("api_rate_limit_requests_per_second", rate, requester="sync")
+        self.metrics.set("api_rate_limit_concurrency", concurrency, requester="sync")
+
+    def get_media(self, url: str, stream: bool = False) -> requests.Response:
+        resp = self.session.get(url, stream=stream, timeout=self.policy.timeout)
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError:
+            resp.close()
+            raise
+        return resp
+
+    def __iter_pages[T](
+        self, get_page: Callable[[int], models.PagedDataModel[T]], prefetch: bool
+    ) -> Iterator[T]:
+        if not prefetch:
+            page: Optional[int] = 1
+            while page is not None:
+                paged_data = get_page(page)
+                page = paged_data.pagination.next
+                yield from paged_data.data
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(get_page, 1)
+            while True:
+                paged_data = future.result()
+                next_page = paged_data.pagination.next
+                if next_page is not None:
+                    future = executor.submit(get_page, next_page)
+                yield from paged_data.data
+                if next_page is None:
+                    return
 
     def get_account(self) -> models.AccountModel:
         url = urls.get_account
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return models.AccountModel(**resp.json())
+        content = self.__get("get_account", url)
+        return models.AccountModel.model_validate_json(content)
 
     def get_account_subscriptions(self) -> list[models.SubscriptionModel]:
         url = urls.get_account_subscriptions
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return TypeAdapter(list[models.SubscriptionModel]).validate_python(resp.json())
+        content = self.__get("get_account_subscriptions", url)
+        return models.subscriptions_adapter.validate_json(content)
 
     def get_plan_posts(
         self, id: str, per_page: int, page: int
     ) -> models.PagedDataModel[models.PostFromListModel]:
         url = urls.get_plan_posts.format(id=id, per_page=per_page, page=page)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return models.PagedDataModel[models.PostFromListModel](**resp.json())
+        content = self.__get("get_plan_posts", url)
+        return models.PagedPostsFromListModel.model_validate_json(content)
+
+    def iter_plan_posts(
+        self, id: str, per_page: int = 200, prefetch: bool = True
+    ) -> Iterator[models.PostFromListModel]:
+        return self.__iter_pages(
+            lambda page: self.get_plan_posts(id, per_page, page), prefetch
+        )
 
     def get_post(self, id: str) -> models.PostModel:
         url = urls.get_post.format(id=id)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return models.PostModel(**resp.json())
+        content = self.__get("get_post", url)
+        return models.PostModel.model_validate_json(content)
 
     def get_post_tags(self, id: str) -> list[models.PostTagModel]:
         url = urls.get_post_tags.format(id=id)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return TypeAdapter(list[models.PostTagModel]).validate_python(resp.json())
+        content = self.__get("get_post_tags", url)
+        return models.post_tags_adapter.validate_json(content)
 
     def get_post_videos(self, id: str) -> models.PostVideosModel:
         url = urls.get_post_videos.format(id=id)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return models.PostVideosModel(**resp.json())
+        content = self.__get("get_post_videos", url)
+        return models.PostVideosModel.model_validate_json(content)
+
+    def get_post_details(
+        self, id: str
+    ) -> tuple[models.PostModel, list[models.PostTagModel], models.PostVideosModel]:
+        post = self.__executor.submit(self.get_post, id)
+        post_tags = self.__executor.submit(self.get_post_tags, id)
+        post_videos = self.__executor.submit(self.get_post_videos, id)
+        return post.result(), post_tags.result(), post_videos.result()
 
     def get_user(
         self, id_or_username: str, by: Literal["id"] | Literal["username"]
     ) -> models.UserModel:
         match by:
             case "id":
+                endpoint = "get_user"
                 url = urls.get_user.format(id=id_or_username)
             case "username":
+                endpoint = "get_user_by_username"
                 url = urls.get_user_by_username.format(username=id_or_username)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return models.UserModel(**resp.json())
+        content = self.__get(endpoint, url)
+        return models.UserModel.model_validate_json(content)
 
     def get_user_plans(self, id: str) -> list[models.PlanModel]:
         url = urls.get_user_plans.format(id=id)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return TypeAdapter(list[models.PlanModel]).validate_python(resp.json())
+        content = self.__get("get_user_plans", url)
+        return models.plans_adapter.validate_json(content)
 
     def get_user_posts(
         self, id: str, per_page: int, page: int
     ) -> models.PagedDataModel[models.PostFromListModel]:
         url = urls.get_user_posts.format(id=id, per_page=per_page, page=page)
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return models.PagedDataModel[models.PostFromListModel](**resp.json())
+        content = self.__get("get_user_posts", url)
+        return models.PagedPostsFromListModel.model_validate_json(content)
+
+    def iter_user_posts(
+        self, id: str, per_page: int = 200, prefetch: bool = True
+    ) -> Iterator[models.PostFromListModel]:
+        return self.__iter_pages(
+            lambda page: self.get_user_posts(id, per_page, page), prefetch
+        )
@@ -0,0 +1,122 @@
+import itertools
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from queue import PriorityQueue
+from threading import Condition, Thread
+from typing import Any, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+
+class JobReport(BaseModel):
+    name: str
+    wait_time: float
+    duration: float
+    size: Optional[int]
+
+
+class ScheduledJob(NamedTuple):
+    name: str
+    function: Callable[..., Any]
+    args: tuple[Any, ...]
+    future: Future[Any]
+    submitted_at: float
+    get_size: Optional[Callable[[Any], Optional[int]]]
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        max_workers: int,
+        on_report: Optional[Callable[[JobReport], None]] = None,
+        on_error: Optional[Callable[[str, BaseException], None]] = None,
+    ) -> None:
+        self.__on_report = on_report
+        self.__on_error = on_error
+        self.__queue: PriorityQueue[tuple[float, int, Optional[ScheduledJob]]] = (
+            PriorityQueue()
+        )
+        self.__counter = itertools.count()
+        self.__condition = Condition()
+        self.__pending_count = 0
+        self.__report_count = 0
+        self.__total_size = 0
+        self.__total_duration = 0.0
+        self.__max_duration = 0.0
+        self.__workers = [
+            Thread(target=self.__work, daemon=True) for _ in range(max(1, max_workers))
+        ]
+        for worker in self.__workers:
+            worker.start()
+
+    def submit[T](
+        self,
+        function: Callable[..., T],
+        *args: Any,
+        name: str,
+        priority: float = 0,
+        get_size: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> Future[T]:
+        future: Future[T] = Future()
+        job = ScheduledJob(name, function, args, future, time.monotonic(), get_size)
+        with self.__condition:
+            self.__pending_count += 1
+        self.__queue.put((priority, next(self.__counter), job))
+        return future
+
+    def join(self) -> None:
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__pending_count == 0)
+
+    def shutdown(self) -> None:
+        for _ in self.__workers:
+            self.__queue.put((float("inf"), next(self.__counter), None))
+        for worker in self.__workers:
+            worker.join()
+
+    def __work(self) -> None:
+        while True:
+            _, _, job = self.__queue.get()
+            if job is None:
+                return
+            started_at = time.monotonic()
+            try:
+                result = job.function(*job.args)
+                finished_at = time.monotonic()
+                size = job.get_size(result) if job.get_size is not None else None
+                report = JobReport(
+                    name=job.name,
+                    wait_time=started_at - job.submitted_at,
+                    duration=finished_at - started_at,
+                    size=size,
+                )
+                self.__add_report(report)
+                if self.__on_report is not None:
+                    self.__on_report(report)
+            except BaseException as e:
+                job.future.set_exception(e)
+                if self.__on_error is not None:
+                    self.__on_error(job.name, e)
+            else:
+                job.future.set_result(result)
+            finally:
+                with self.__condition:
+                    self.__pending_count -= 1
+                    self.__condition.notify_all()
+
+    def __add_report(self, report: JobReport) -> None:
+        with self.__condition:
+            self.__report_count += 1
+            self.__total_size += report.size or 0
+            self.__total_duration += report.duration
+            self.__max_duration = max(self.__max_duration, report.duration)
+
+    def get_summary(self, name: str) -> str:
+        with self.__condition:
+            return (
+                f"{name}: {self.__report_count} jobs, "
+                f"{self.__total_size / 1024 / 1024:.1f} MiB, "
+                f"{self.__total_duration:.1f}s total, "
+                f"{self.__max_duration:.1f}s longest"
+            )
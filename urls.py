@@ -1,4 +1,6 @@
-API_BASE = "https://api.myfans.jp/api"
+import os
+
+API_BASE = os.environ.get("MYFANS_API_BASE", "https://api.myfans.jp/api")
 
 get_account = f"{API_BASE}/v1/account"
 get_account_subscriptions = f"{API_BASE}/v1/account/subscriptions"
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+from os import path
+from typing import NamedTuple, Optional
+
+import requests
+
+from config import RequestConfig
+
+LATEST_USER_AGENTS_API_URL = "https://jnrbsn.github.io/user-agents/user-agents.json"
+FALLBACK_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36"
+FETCH_TIMEOUT = 5
+FAILED_FETCH_RETRY_SECONDS = 3600
+
+
+class CachedUserAgent(NamedTuple):
+    user_agent: str
+    expires_at: float
+
+
+def get_latest_windows_chrome_user_agent() -> str:
+    user_agents: list[str] = requests.get(
+        LATEST_USER_AGENTS_API_URL, timeout=FETCH_TIMEOUT
+    ).json()
+    for user_agent in user_agents:
+        if (
+            "Windows NT" in user_agent
+            and "Chrome/" in user_agent
+            and not "Edg/" in user_agent
+        ):
+            return user_agent
+    raise ValueError("No user agent found")
+
+
+def read_cached_user_agent(file_path: str) -> Optional[CachedUserAgent]:
+    try:
+        with open(file_path, "r") as f:
+            return CachedUserAgent(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def write_cached_user_agent(file_path: str, cached: CachedUserAgent) -> None:
+    if (dir_path := path.dirname(file_path)) != "":
+        os.makedirs(dir_path, exist_ok=True)
+    temp_file_path = f"{file_path}.tmp"
+    with open(temp_file_path, "w") as f:
+        json.dump(cached._asdict(), f)
+    os.replace(temp_file_path, file_path)
+
+
+def resolve_user_agent(config: RequestConfig) -> str:
+    if config.user_agent is not None and config.user_agent != "":
+        return config.user_agent
+    file_path = config.user_agent_cache_file_path
+    cached = read_cached_user_agent(file_path)
+    now = time.time()
+    if cached is not None and cached.expires_at > now:
+        return cached.user_agent
+    try:
+        cached = CachedUserAgent(
+            get_latest_windows_chrome_user_agent(),
+            now + config.user_agent_cache_ttl_seconds,
+        )
+    except (requests.RequestException, ValueError):
+        cached = CachedUserAgent(
+            cached.user_agent if cached is not None else FALLBACK_USER_AGENT,
+            now + min(config.user_agent_cache_ttl_seconds, FAILED_FETCH_RETRY_SECONDS),
+        )
+    try:
+        write_cached_user_agent(file_path, cached)
+    except OSError:
+        pass
+    return cached.user_agent